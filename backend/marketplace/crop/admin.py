@@ -1,6 +1,49 @@
 from django.contrib import admin
+from django.db import transaction
+
+from user.recommender import rescore
 from .models import KebeleCrop, Crop
 # Register your models here.
 
-admin.site.register(KebeleCrop)
-admin.site.register(Crop)
+
+class RescoreOnChangeAdmin(admin.ModelAdmin):
+    """
+    Admin edits rescore only the stored recommendations they can affect, once the
+    edit is committed, instead of waiting for a full refresh_recommendations.
+
+    Subclasses define scope(objs), returning the rescore() arguments that cover the
+    given objects.
+    """
+
+    def _rescore_after_commit(self, scope):
+        transaction.on_commit(lambda: rescore(**scope))
+
+    def save_model(self, request, obj, form, change):
+        # A renamed crop / moved row also has to clear its old pair
+        old = type(obj).objects.filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        self._rescore_after_commit(self.scope([obj] + ([old] if old else [])))
+
+    def delete_model(self, request, obj):
+        scope = self.scope([obj])
+        super().delete_model(request, obj)
+        self._rescore_after_commit(scope)
+
+    def delete_queryset(self, request, queryset):
+        scope = self.scope(list(queryset))
+        super().delete_queryset(request, queryset)
+        self._rescore_after_commit(scope)
+
+
+@admin.register(Crop)
+class CropAdmin(RescoreOnChangeAdmin):
+    def scope(self, objs):
+        """Every kebele can hold an edited crop."""
+        return {"crops": {obj.name for obj in objs}}
+
+
+@admin.register(KebeleCrop)
+class KebeleCropAdmin(RescoreOnChangeAdmin):
+    def scope(self, objs):
+        """Only the rows' own kebeles and crops."""
+        return {"kebele_ids": {obj.kebele_id for obj in objs}, "crops": {obj.crop_id for obj in objs}}
@@ -0,0 +1,233 @@
+"""
+Ingest of the feature pipeline's output (scrapers/pipeline.py) into the database.
+
+The pipeline writes one CSV per feature group with a row per (crop, region,
+kebele, year): FEATURE_FILES below, in settings.FEATURES_DIR. ingest_features()
+turns them into
+
+  KebeleCrop  one profile per (kebele, crop): the mean of every feature over the
+              seasons observed, missing ones filled with the crop's median over
+              the other kebeles (as scrapers/clean_merge.py does);
+  Crop        requirement profiles derived from the same seasons: the 10th / 50th
+              / 90th percentile for the _min / _opt / _max bounds and the median
+              for everything else. By default only crops without a profile get
+              one, so curated profiles are never overwritten;
+
+and writes them in one transaction through the database's bulk path: COPY into
+a temporary table and one INSERT ... SELECT ... ON CONFLICT on PostgreSQL, an
+executemany of INSERT ... ON CONFLICT elsewhere (SQLite). Like the CSV
+loaders, it bypasses model signals and retires the caches itself; the
+ingest_features command then rebuilds the stored recommendations and the
+snapshot.
+"""
+import io
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.constants import OnConflict
+
+from user.models import Kebele
+from .loaders import BATCH_SIZE, CROP_FIELDS, KEBELE_CROP_FIELDS, crops_changed, content_hashes
+from .models import Crop, KebeleCrop
+
+FEATURE_FILES = {
+    "rainfall": "rainfall_features_per_crop_kebele_season.csv",
+    "temperature": "temperature_features_per_crop_kebele_season.csv",
+    "soil_moisture": "soil_moisture_features_per_crop_kebele_season.csv",
+    "ndvi": "ndvi_features_per_crop_kebele_season.csv",
+}
+KEYS = ["kebele", "crop"]
+# Percentile of the observed seasons used for each requirement bound
+BOUNDS = {"_min": 0.1, "_opt": 0.5, "_max": 0.9}
+# Quality of a derived Crop profile when every season was flagged OK (curated ones are 0.75-0.85)
+DERIVED_QUALITY = 0.75
+CROP_PROFILES = ("missing", "all", "none")
+
+
+@dataclass
+class IngestResult:
+    """Rows read and written by one ingest, the (kebele, crop) pairs left out, and seconds per stage."""
+    read: int = 0
+    kebele_crops: int = 0
+    crops: int = 0
+    deleted: int = 0
+    incomplete: list[tuple[str, str]] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def summary(self, limit: int = 20) -> str:
+        lines = [f"{self.read} season rows read, {self.kebele_crops} kebele crop profiles and "
+                 f"{self.crops} crop profiles written, {self.deleted} deleted."]
+        if self.incomplete:
+            lines.append(f"{len(self.incomplete)} kebele/crop pairs left out (features missing everywhere):")
+            lines += [f"  {kebele} / {crop}" for kebele, crop in self.incomplete[:limit]]
+            if len(self.incomplete) > limit:
+                lines.append(f"  ... and {len(self.incomplete) - limit} more")
+        return "\n".join(lines)
+
+
+def read_features(source_dir=None) -> dict[str, pd.DataFrame]:
+    """
+    The season rows of each feature file in source_dir (default settings.FEATURES_DIR):
+    kebele and crop as stripped strings plus the file's numeric feature columns.
+    Rows without a kebele or crop are dropped. Raises OSError for a missing file.
+    """
+    source_dir = source_dir or settings.FEATURES_DIR
+    frames = {}
+    for group, filename in FEATURE_FILES.items():
+        df = pd.read_csv(os.path.join(source_dir, filename), dtype={key: str for key in KEYS},
+                         float_precision="round_trip", skipinitialspace=True)
+        for key in KEYS:
+            df[key] = df[key].str.strip()
+        df = df[df[KEYS].notna().all(axis=1) & (df[KEYS] != "").all(axis=1)]
+        features = [c for c in df.columns if c in KEBELE_CROP_FIELDS]
+        frame = df[KEYS].copy()
+        for column in features:
+            frame[column] = pd.to_numeric(df[column], errors="coerce")
+        if "data_quality_flag" in df.columns:
+            frame["flag_ok"] = df["data_quality_flag"].astype(str).str.strip().str.upper().eq("OK")
+        frames[group] = frame
+    return frames
+
+
+def kebele_crop_profiles(frames: dict[str, pd.DataFrame]) -> tuple[pd.DataFrame, list[tuple[str, str]]]:
+    """
+    One row per (kebele, crop) with kebele, crop, KEBELE_CROP_FIELDS and content_hash,
+    and the pairs dropped because a feature could not be filled.
+    """
+    means = [frame.groupby(KEYS)[[c for c in frame.columns if c in KEBELE_CROP_FIELDS]].mean()
+             for frame in frames.values()]
+    profiles = pd.concat(means, axis=1, join="outer")
+    missing = [c for c in KEBELE_CROP_FIELDS if c not in profiles.columns]
+    if missing:
+        raise ValueError(f"No feature file has: {', '.join(missing)}")
+    profiles = profiles[KEBELE_CROP_FIELDS].reset_index()
+
+    medians = profiles.groupby("crop")[KEBELE_CROP_FIELDS].transform("median")
+    profiles[KEBELE_CROP_FIELDS] = profiles[KEBELE_CROP_FIELDS].fillna(medians)
+    incomplete = profiles[KEBELE_CROP_FIELDS].isna().any(axis=1)
+    dropped = list(zip(profiles.loc[incomplete, "kebele"], profiles.loc[incomplete, "crop"]))
+    profiles = profiles[~incomplete].reset_index(drop=True)
+    profiles["content_hash"] = content_hashes(profiles)
+    return profiles, sorted(dropped)
+
+
+def crop_profiles(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Crop requirement profiles (name + CROP_FIELDS) derived from the season rows, for
+    the crops observed with every feature. Integer fields are rounded.
+    """
+    columns = {}
+    for frame in frames.values():
+        by_crop = frame.groupby("crop")
+        for name in CROP_FIELDS:
+            base, bound = name[:-4], BOUNDS.get(name[-4:])
+            if bound is not None and base in frame.columns:
+                columns[name] = by_crop[base].quantile(bound)
+            elif name in frame.columns:
+                columns[name] = by_crop[name].median()
+        if "flag_ok" in frame.columns:
+            columns["data_quality_flag"] = by_crop["flag_ok"].mean() * DERIVED_QUALITY
+    # Files without a quality flag count as all OK
+    columns.setdefault("data_quality_flag", DERIVED_QUALITY)
+    missing = [name for name in CROP_FIELDS if name not in columns]
+    if missing:
+        raise ValueError(f"No feature file has the data for Crop fields: {', '.join(missing)}")
+
+    profiles = pd.DataFrame(columns)[CROP_FIELDS].dropna()
+    for name in CROP_FIELDS:
+        if isinstance(Crop._meta.get_field(name), models.IntegerField):
+            profiles[name] = profiles[name].round().astype(np.int64)
+    return profiles.rename_axis("name").reset_index()
+
+
+def bulk_upsert(model, df: pd.DataFrame, unique_fields: list[str], batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert or update the rows of df (columns named after model fields) by unique_fields
+    through the database's bulk path: COPY + INSERT ... SELECT on PostgreSQL, an
+    executemany per batch_size rows elsewhere. Returns the number of rows sent.
+    """
+    if df.empty:
+        return 0
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in df.columns]
+    table = qn(model._meta.db_table)
+    column_list = ", ".join(qn(f.column) for f in fields)
+    conflict = connection.ops.on_conflict_suffix_sql(
+        fields, OnConflict.UPDATE,
+        [f.column for f in fields if f.name not in unique_fields],
+        [model._meta.get_field(name).column for name in unique_fields],
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            temp = qn(f"ingest_{model._meta.db_table}")
+            buffer = io.StringIO()
+            df.to_csv(buffer, index=False, header=False)
+            cursor.execute(f"CREATE TEMPORARY TABLE {temp} ON COMMIT DROP AS "
+                           f"SELECT {column_list} FROM {table} WITH NO DATA")
+            copy_sql = f"COPY {temp} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+            raw = cursor.cursor
+            if hasattr(raw, "copy"):   # psycopg 3
+                with raw.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            else:                      # psycopg2
+                buffer.seek(0)
+                raw.copy_expert(copy_sql, buffer)
+            cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {temp} {conflict}")
+            cursor.execute(f"DROP TABLE {temp}")
+        else:
+            sql = f"INSERT INTO {table} ({column_list}) VALUES ({', '.join(['%s'] * len(fields))}) {conflict}"
+            rows = list(df.astype(object).itertuples(index=False, name=None))
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+    return len(df)
+
+
+def ingest_features(source_dir=None, crop_profiles_mode: str = "missing", delete_missing: bool = False,
+                    batch_size: int = BATCH_SIZE) -> IngestResult:
+    """
+    Aggregate the pipeline's feature files into KebeleCrop and Crop profiles and write
+    them in one transaction (see the module docstring).
+
+    crop_profiles_mode: "missing" writes derived Crop profiles only for crops that have
+    none, "all" overwrites every observed crop's profile, "none" leaves Crop alone.
+    delete_missing: the files are the complete data set, so stored KebeleCrop rows
+    they do not cover are deleted.
+    """
+    if crop_profiles_mode not in CROP_PROFILES:
+        raise ValueError(f"crop_profiles_mode must be one of {', '.join(CROP_PROFILES)}")
+    result = IngestResult()
+    started = time.perf_counter()
+
+    frames = read_features(source_dir)
+    result.read = sum(len(frame) for frame in frames.values())
+    result.timings["read"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    profiles, result.incomplete = kebele_crop_profiles(frames)
+    crops = crop_profiles(frames) if crop_profiles_mode != "none" else None
+    result.timings["aggregate"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with transaction.atomic():
+        if crops is not None:
+            if crop_profiles_mode == "missing":
+                crops = crops[~crops["name"].isin(Crop.objects.values_list("name", flat=True))]
+            result.crops = bulk_upsert(Crop, crops, ["name"], batch_size)
+        Kebele.objects.bulk_create([Kebele(kebele_id=k) for k in profiles["kebele"].unique()],
+                                   batch_size=batch_size, ignore_conflicts=True)
+        result.kebele_crops = bulk_upsert(KebeleCrop, profiles, KEYS, batch_size)
+        if delete_missing:
+            keep = set(zip(profiles["kebele"], profiles["crop"]))
+            gone = [pk for pk, kebele, crop in KebeleCrop.objects.values_list("id", "kebele", "crop")
+                    if (kebele, crop) not in keep]
+            for start in range(0, len(gone), BATCH_SIZE):
+                KebeleCrop.objects.filter(id__in=gone[start:start + BATCH_SIZE]).delete()
+            result.deleted = len(gone)
+        transaction.on_commit(crops_changed)
+    result.timings["write"] = time.perf_counter() - started
+    return result
@@ -0,0 +1,286 @@
+"""
+CSV loaders for the Crop and KebeleCrop tables.
+
+A file is parsed with pandas and validated column-wise (missing keys, values that
+are not numbers, integers with a fraction) in a handful of vectorized passes.
+Invalid rows are skipped and reported (CSV line and reason) in the returned
+LoadResult. Everything is written inside one transaction.
+
+Crop files are small and are upserted whole, keyed by Crop.name, with
+bulk_create(update_conflicts=True). KebeleCrop files can cover the whole country,
+so they are streamed in chunks of CHUNK_SIZE rows. Each (kebele, crop) record is
+hashed and compared with KebeleCrop.content_hash, and only the difference is
+written: new records are inserted and changed ones upserted. With
+delete_missing, stored records absent from the file are deleted. Memory stays
+bounded by the chunk size plus 8 bytes per stored row, and the ChangeSet of
+touched keys tells callers what to rescore.
+
+bulk_create sends no model signals. The loaders therefore retire the cached crop
+matrix, the snapshot and cached responses themselves. Stored recommendations are
+left to the caller (refresh_recommendations / refresh_changed, as the load_crops
+and load_kebele_crops commands do).
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from django.db import models, transaction
+
+from user.models import Kebele
+from user.recommender import invalidate_crop_matrix, invalidate_recommendations, rescore, write_snapshot
+from user.snapshot import discard_snapshot
+from .models import Crop, KebeleCrop
+
+BATCH_SIZE = 2000
+CHUNK_SIZE = 50000
+# Kebeles per stored-hash lookup (keeps the IN list within the database's parameter limit)
+LOOKUP_BATCH = 500
+# First data row of a CSV file (line 1 is the header)
+FIRST_LINE = 2
+
+CROP_NAME_COLUMNS = ("Crop", "crop", "name")
+CROP_FIELDS = [f.name for f in Crop._meta.concrete_fields if f.name not in ("id", "name")]
+KEBELE_CROP_FIELDS = [f.name for f in KebeleCrop._meta.concrete_fields
+                      if f.name not in ("id", "kebele", "crop", "content_hash")]
+
+
+@dataclass
+class ChangeSet:
+    """(kebele, crop) keys a load inserted, updated and deleted."""
+    inserted: list[tuple[str, str]] = field(default_factory=list)
+    updated: list[tuple[str, str]] = field(default_factory=list)
+    deleted: list[tuple[str, str]] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+    @property
+    def kebele_ids(self) -> set[str]:
+        return {kebele for kebele, _ in self.inserted + self.updated + self.deleted}
+
+    @property
+    def crops(self) -> set[str]:
+        return {crop for _, crop in self.inserted + self.updated + self.deleted}
+
+
+@dataclass
+class LoadResult:
+    """
+    Outcome of one load: rows written, the rejected ones as (CSV line, reason), for
+    KebeleCrop loads what changed, and the number of CSV rows read.
+    """
+    loaded: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    changes: ChangeSet | None = None
+    read: int = 0
+
+    def summary(self, limit: int = 20) -> str:
+        lines = [f"{self.read} rows read, {self.loaded} written, {len(self.errors)} rejected."]
+        if self.changes is not None:
+            lines.append(f"{len(self.changes.inserted)} inserted, {len(self.changes.updated)} updated, "
+                         f"{len(self.changes.deleted)} deleted.")
+        lines += [f"  line {line}: {reason}" for line, reason in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f"  ... and {len(self.errors) - limit} more")
+        return "\n".join(lines)
+
+
+def read_csv(source, keys, chunk_size: int | None = None):
+    """
+    The CSV as DataFrames of up to chunk_size rows (default: one for the whole file),
+    indexed by CSV line: key columns as strings, clean numeric columns as exactly
+    parsed floats, columns with anything else in them left as strings.
+    """
+    reader = pd.read_csv(source, dtype={key: str for key in keys}, float_precision="round_trip",
+                         skipinitialspace=True, chunksize=chunk_size)
+    line = FIRST_LINE
+    for df in reader if chunk_size else [reader]:
+        df.index = np.arange(line, line + len(df))
+        line += len(df)
+        yield df
+
+
+def validate(df: pd.DataFrame, keys: list[str], model, fields: list[str]) -> tuple[pd.DataFrame, list[tuple[int, str]]]:
+    """
+    Typed copy of the valid rows of df (key columns + the given numeric fields of
+    model) and the errors of the rest. Later rows win over earlier ones with the
+    same keys. Raises ValueError when whole columns are missing.
+    """
+    numeric = [model._meta.get_field(name) for name in fields]
+    missing = [c for c in keys + [f.name for f in numeric] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    checks = []   # (column, mask of offending rows, reason)
+    clean = pd.DataFrame(index=df.index)
+    for key in keys:
+        values = df[key].str.strip()
+        checks.append((key, values.isna() | (values == ""), "missing"))
+        clean[key] = values
+    for f in numeric:
+        if pd.api.types.is_numeric_dtype(df[f.name]):
+            values = df[f.name].astype(np.float64)
+            checks.append((f.name, values.isna(), "missing"))
+        else:
+            raw = df[f.name].astype("string").str.strip()
+            blank = raw.isna() | (raw == "")
+            values = pd.to_numeric(raw, errors="coerce")
+            # to_numeric's fast parser can be an ulp off; parse the valid ones exactly
+            parsed = values.notna()
+            values[parsed] = raw[parsed].astype(np.float64)
+            checks.append((f.name, blank, "missing"))
+            checks.append((f.name, values.isna() & ~blank, "not a number"))
+        if isinstance(f, models.IntegerField):
+            checks.append((f.name, values.notna() & (values != values.round()), "not an integer"))
+            values = values.round().astype("Int64")
+        clean[f.name] = values
+
+    bad = np.logical_or.reduce([mask.to_numpy() for _, mask, _ in checks])
+    errors = [
+        (line, "; ".join(
+            f"{column}: {reason}" if reason == "missing" else f"{column}: {reason} ({df.at[line, column]!r})"
+            for column, mask, reason in checks if mask[line]
+        ))
+        for line in df.index[bad]
+    ]
+    clean = clean[~bad]
+    duplicated = clean.duplicated(keys, keep="last")
+    errors += [(line, f"duplicate {'/'.join(keys)}, superseded by a later line") for line in clean.index[duplicated]]
+    return clean[~duplicated], sorted(errors)
+
+
+def load_crops(source, batch_size: int = BATCH_SIZE, strict: bool = False) -> LoadResult:
+    """
+    Upsert Crop requirement profiles from a CSV file (name in a Crop / crop / name
+    column). strict: write nothing when any row is rejected.
+    """
+    df = next(read_csv(source, CROP_NAME_COLUMNS))
+    name_column = next((c for c in CROP_NAME_COLUMNS if c in df.columns), CROP_NAME_COLUMNS[0])
+    clean, errors = validate(df.rename(columns={name_column: "name"}), ["name"], Crop, CROP_FIELDS)
+    if strict and errors:
+        return LoadResult(0, errors, read=len(df))
+    objs = _instances(Crop, clean[["name"] + CROP_FIELDS])
+    with transaction.atomic():
+        Crop.objects.bulk_create(objs, batch_size=batch_size, update_conflicts=True,
+                                 unique_fields=["name"], update_fields=CROP_FIELDS)
+        transaction.on_commit(crops_changed)
+    return LoadResult(len(objs), errors, read=len(df))
+
+
+def content_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of each row's KebeleCrop feature values (as stored in content_hash)."""
+    hashes = pd.util.hash_pandas_object(df[KEBELE_CROP_FIELDS].astype(np.float64), index=False)
+    return hashes.to_numpy().view(np.int64)
+
+
+def load_kebele_crops(source, batch_size: int = BATCH_SIZE, strict: bool = False,
+                      chunk_size: int = CHUNK_SIZE, delete_missing: bool = False) -> LoadResult:
+    """
+    Stream KebeleCrop observations from a CSV file with kebele, crop and feature
+    columns and write only what differs from the stored rows (see the module
+    docstring), creating missing Kebele rows.
+
+    strict: write nothing when any row is rejected. delete_missing: the file is the
+    complete data set, so stored records it does not contain are deleted (skipped
+    when rows were rejected, so a bad line never deletes its record).
+    """
+    keys = ["kebele", "crop"]
+    errors, changes, read = [], ChangeSet(), 0
+    kept = []   # ids of stored rows the file still contains
+    with transaction.atomic():
+        # Rows inserted by this load get higher ids; only rows up to here can go missing
+        last_id = KebeleCrop.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        for chunk in read_csv(source, keys, chunk_size):
+            read += len(chunk)
+            clean, chunk_errors = validate(chunk, keys, KebeleCrop, KEBELE_CROP_FIELDS)
+            errors += chunk_errors
+            if strict and errors:
+                continue
+            clean["content_hash"] = content_hashes(clean)
+            kept.append(_write_chunk(clean, changes, last_id, batch_size))
+
+        if strict and errors:
+            transaction.set_rollback(True)
+            return LoadResult(0, sorted(errors), read=read)
+        if delete_missing and not errors:
+            _delete_missing(np.unique(np.concatenate(kept or [np.empty(0, np.int64)])), last_id, changes)
+        if changes:
+            transaction.on_commit(kebele_crops_changed)
+    return LoadResult(len(changes.inserted) + len(changes.updated), sorted(errors), changes, read)
+
+
+def _write_chunk(clean: pd.DataFrame, changes: ChangeSet, last_id: int, batch_size: int) -> np.ndarray:
+    """Insert the new and upsert the changed records of one validated chunk; returns the ids it matched."""
+    stored = {}
+    kebeles = clean["kebele"].unique().tolist()
+    for start in range(0, len(kebeles), LOOKUP_BATCH):
+        rows = (KebeleCrop.objects.filter(kebele__in=kebeles[start:start + LOOKUP_BATCH])
+                .values_list("kebele", "crop", "id", "content_hash"))
+        stored.update(((kebele, crop), (pk, content_hash)) for kebele, crop, pk, content_hash in rows)
+
+    match = [stored.get(key, (-1, None)) for key in zip(clean["kebele"], clean["crop"])]
+    ids = np.fromiter((pk for pk, _ in match), dtype=np.int64, count=len(match))
+    stored_hashes = np.array([content_hash for _, content_hash in match], dtype=object)
+    is_new = ids < 0
+    # None (row written outside the loaders) never equals a hash
+    changed = ~is_new & (stored_hashes != clean["content_hash"].to_numpy())
+
+    columns = ["kebele", "crop"] + KEBELE_CROP_FIELDS + ["content_hash"]
+    new, updated = clean.loc[is_new, columns], clean.loc[changed, columns]
+    if len(new):
+        Kebele.objects.bulk_create([Kebele(kebele_id=k) for k in new["kebele"].unique()],
+                                   batch_size=batch_size, ignore_conflicts=True)
+        KebeleCrop.objects.bulk_create(_instances(KebeleCrop, new), batch_size=batch_size)
+        changes.inserted += list(zip(new["kebele"], new["crop"]))
+    if len(updated):
+        KebeleCrop.objects.bulk_create(_instances(KebeleCrop, updated), batch_size=batch_size,
+                                       update_conflicts=True, unique_fields=["kebele", "crop"],
+                                       update_fields=KEBELE_CROP_FIELDS + ["content_hash"])
+        # A record inserted by an earlier chunk and repeated later is still just an insert
+        changes.updated += [key for key, pk in zip(zip(updated["kebele"], updated["crop"]), ids[changed])
+                            if pk <= last_id]
+    return ids[~is_new]
+
+
+def _delete_missing(kept: np.ndarray, last_id: int, changes: ChangeSet):
+    """Delete stored rows (ids up to last_id) that are not in kept, in id order batches."""
+    rows = KebeleCrop.objects.filter(id__lte=last_id).order_by("id").values_list("id", "kebele", "crop")
+    after = 0
+    while True:
+        batch = list(rows.filter(id__gt=after)[:BATCH_SIZE])
+        if not batch:
+            break
+        after = batch[-1][0]
+        ids = np.fromiter((pk for pk, _, _ in batch), dtype=np.int64, count=len(batch))
+        gone = ~np.isin(ids, kept, assume_unique=True)
+        if gone.any():
+            KebeleCrop.objects.filter(id__in=ids[gone].tolist()).delete()
+            changes.deleted += [(kebele, crop) for (_, kebele, crop), g in zip(batch, gone) if g]
+
+
+def refresh_changed(changes: ChangeSet) -> dict:
+    """
+    Bring the stored recommendations of the kebeles a load touched up to date, and
+    write a new snapshot. Returns rescore()'s counts plus whether the snapshot was
+    published ({} when nothing changed).
+    """
+    if not changes:
+        return {}
+    counts = rescore(kebele_ids=changes.kebele_ids)
+    return dict(counts, snapshot=write_snapshot() is not None)
+
+
+def _instances(model, df: pd.DataFrame) -> list:
+    """Unsaved model instances from df, whose columns are the model's fields after id, in order."""
+    # Positional arguments skip Model.__init__'s keyword handling, by far its slow part
+    return [model(None, *row) for row in df.astype(object).itertuples(index=False, name=None)]
+
+
+def crops_changed():
+    invalidate_crop_matrix()
+    kebele_crops_changed()
+
+
+def kebele_crops_changed():
+    invalidate_recommendations()
+    discard_snapshot()
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crop.ingest import BATCH_SIZE, CROP_PROFILES, ingest_features
+from user.recommender import SNAPSHOT_SKIPPED, refresh_recommendations, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate the feature pipeline's per-season CSVs into KebeleCrop and Crop profiles, "
+        "bulk-load them in one transaction, then refresh the stored recommendations and the "
+        "snapshot. Meant to run on a schedule after scrapers/pipeline.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source-dir", help="Directory with the feature CSVs (default settings.FEATURES_DIR).")
+        parser.add_argument("--crop-profiles", choices=CROP_PROFILES, default="missing",
+                            help="Derived Crop profiles to write: for crops without one (default), "
+                                 "for every observed crop, or none.")
+        parser.add_argument("--delete-missing", action="store_true",
+                            help="Delete stored KebeleCrop rows the files do not cover.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per executemany call.")
+        parser.add_argument("--no-refresh", action="store_true",
+                            help="Leave the stored recommendations and the snapshot as they are.")
+
+    def handle(self, *args, **options):
+        try:
+            result = ingest_features(options["source_dir"], crop_profiles_mode=options["crop_profiles"],
+                                     delete_missing=options["delete_missing"], batch_size=options["batch_size"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(result.summary())
+
+        rows = {"read": result.read, "write": result.kebele_crops + result.crops}
+        for stage, seconds in result.timings.items():
+            rate = f" ({rows[stage] / max(seconds, 1e-9):.0f} rows/s)" if stage in rows else ""
+            self.stdout.write(f"  {stage:<10}{seconds:8.3f}s{rate}")
+
+        if not options["no_refresh"]:
+            started = time.perf_counter()
+            written = refresh_recommendations()
+            snapshot = write_snapshot()
+            self.stdout.write(f"  {'refresh':<10}{time.perf_counter() - started:8.3f}s")
+            if snapshot is None:
+                self.stdout.write(self.style.WARNING(SNAPSHOT_SKIPPED))
+            self.stdout.write(self.style.SUCCESS(f"{written} recommendations written."))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crop.loaders import BATCH_SIZE, load_crops
+from user.recommender import SNAPSHOT_SKIPPED, refresh_recommendations, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert Crop requirement profiles from a CSV file in one transaction, list the "
+        "rejected rows, then refresh the stored recommendations and the snapshot."
+    )
+    loader = staticmethod(load_crops)
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv", help="CSV file to load.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per INSERT statement.")
+        parser.add_argument("--strict", action="store_true", help="Load nothing if any row is rejected.")
+        parser.add_argument("--errors", type=int, default=20, help="Rejected rows to list (default 20).")
+        parser.add_argument("--no-refresh", action="store_true",
+                            help="Leave the stored recommendations and the snapshot as they are.")
+
+    def load(self, options):
+        return self.loader(options["csv"], batch_size=options["batch_size"], strict=options["strict"])
+
+    def refresh(self, result):
+        written = refresh_recommendations()
+        if write_snapshot() is None:
+            self.stdout.write(self.style.WARNING(SNAPSHOT_SKIPPED))
+        self.stdout.write(self.style.SUCCESS(f"{written} recommendations written."))
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result = self.load(options)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"{options['csv']}: {e}")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(result.summary(options["errors"]))
+        if options["strict"] and result.errors:
+            raise CommandError("Rows were rejected; nothing was loaded (--strict).")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded in {elapsed:.2f}s ({result.read / max(elapsed, 1e-9):.0f} rows/s read)."
+        ))
+        if not options["no_refresh"]:
+            self.refresh(result)
@@ -0,0 +1,30 @@
+from crop.loaders import CHUNK_SIZE, load_kebele_crops, refresh_changed
+from .load_crops import Command as LoadCropsCommand
+
+
+class Command(LoadCropsCommand):
+    help = (
+        "Stream KebeleCrop observations (one row per kebele and crop) from a CSV file and "
+        "write only the records that changed, in one transaction; list the rejected rows, "
+        "then rescore the kebeles that changed and update the snapshot."
+    )
+    loader = staticmethod(load_kebele_crops)
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="CSV rows read at a time.")
+        parser.add_argument("--delete-missing", action="store_true",
+                            help="The file is the complete data set: delete stored records it does not contain.")
+
+    def load(self, options):
+        return self.loader(options["csv"], batch_size=options["batch_size"], strict=options["strict"],
+                           chunk_size=options["chunk_size"], delete_missing=options["delete_missing"])
+
+    def refresh(self, result):
+        if not result.changes:
+            self.stdout.write("Nothing changed; recommendations and snapshot left as they are.")
+            return
+        counts = refresh_changed(result.changes)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {len(result.changes.kebele_ids)} kebeles ({counts})."
+        ))
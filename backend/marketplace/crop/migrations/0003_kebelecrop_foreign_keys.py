@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_missing_kebeles(apps, schema_editor):
+    """Every kebele observed in KebeleCrop gets a Kebele row; rows without a kebele are dropped."""
+    Kebele = apps.get_model('user', 'Kebele')
+    KebeleCrop = apps.get_model('crop', 'KebeleCrop')
+    KebeleCrop.objects.filter(kebele__in=['', None]).delete()
+    observed = set(KebeleCrop.objects.values_list('kebele', flat=True).distinct())
+    known = set(Kebele.objects.values_list('kebele_id', flat=True))
+    Kebele.objects.bulk_create([Kebele(kebele_id=k) for k in sorted(observed - known)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crop', '0002_kebelecrop'),
+        ('user', '0008_kebele_unique_landdetail_region'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_kebeles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='kebelecrop',
+            name='crop',
+            field=models.ForeignKey(db_column='crop', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='kebele_observations', to='crop.crop', to_field='name'),
+        ),
+        migrations.AlterField(
+            model_name='kebelecrop',
+            name='kebele',
+            field=models.ForeignKey(db_column='kebele', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='crop_observations', to='user.kebele', to_field='kebele_id'),
+        ),
+        migrations.AddIndex(
+            model_name='kebelecrop',
+            index=models.Index(fields=['kebele', 'crop'], name='kebelecrop_kebele_crop_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:59
+
+from django.db import migrations, models
+
+
+def drop_duplicate_observations(apps, schema_editor):
+    """Keep the newest KebeleCrop row of each (kebele, crop) pair."""
+    KebeleCrop = apps.get_model('crop', 'KebeleCrop')
+    newest = {}
+    for pk, kebele, crop in KebeleCrop.objects.order_by('id').values_list('id', 'kebele', 'crop'):
+        newest[(kebele, crop)] = pk
+    KebeleCrop.objects.exclude(pk__in=list(newest.values())).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crop', '0003_kebelecrop_foreign_keys'),
+        ('user', '0008_kebele_unique_landdetail_region'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_observations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='kebelecrop',
+            constraint=models.UniqueConstraint(fields=('kebele', 'crop'), name='unique_kebele_crop'),
+        ),
+        migrations.RemoveIndex(
+            model_name='kebelecrop',
+            name='kebelecrop_kebele_crop_idx',
+        ),
+    ]
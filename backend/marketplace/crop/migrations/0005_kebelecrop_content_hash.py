@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crop', '0004_kebelecrop_unique_kebele_crop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kebelecrop',
+            name='content_hash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
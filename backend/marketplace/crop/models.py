@@ -41,8 +41,15 @@ class Crop(models.Model):
         return self.name
 
 class KebeleCrop(models.Model):
-    kebele = models.CharField(max_length=100)
-    crop = models.CharField(max_length=100)
+    # Both keep their original columns and hold the natural keys (kebele_id / crop name),
+    # so values_list("kebele", "crop") still returns plain ids without a join.
+    kebele = models.ForeignKey('user.Kebele', on_delete=models.CASCADE, to_field='kebele_id',
+                               db_column='kebele', related_name='crop_observations',
+                               db_index=False)  # leading column of unique_kebele_crop
+    # Observations may exist for crops that have no requirement profile (Crop row) yet,
+    # so the crop key is not enforced by the database.
+    crop = models.ForeignKey(Crop, on_delete=models.DO_NOTHING, to_field='name', db_column='crop',
+                             db_constraint=False, related_name='kebele_observations')
     seasonal_rainfall_total = models.FloatField()
     onset_date = models.FloatField()
     cessation_date = models.FloatField()
@@ -73,6 +80,21 @@ class KebeleCrop(models.Model):
     ndvi_integral = models.FloatField()
     ndvi_threshold = models.FloatField()
     ndvi_anomaly_avg = models.FloatField()
+    # Hash of the feature values as last loaded by crop.loaders; None once the row is
+    # written any other way, so the next load rewrites it instead of skipping it
+    content_hash = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            # One observation profile per kebele and crop; the loaders upsert on it
+            models.UniqueConstraint(fields=['kebele', 'crop'], name='unique_kebele_crop'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.content_hash = None
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "content_hash"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.kebele} - {self.crop}"
\ No newline at end of file
+        return f"{self.kebele_id} - {self.crop_id}"
\ No newline at end of file
@@ -1,3 +1,112 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+import pandas as pd
+from django.test import TestCase, override_settings
+
+from user.matcher import AREA_FEATURES
+from user.models import Kebele
+from .ingest import FEATURE_FILES, ingest_features
+from .loaders import CROP_FIELDS, KEBELE_CROP_FIELDS, load_kebele_crops
+from .models import Crop, KebeleCrop
+
+
+# Snapshots and other MODELS_DIR artifacts the code under test writes go to a
+# scratch directory, never the developer's models/
+MODELS_DIR = tempfile.mkdtemp(prefix="shemeta-test-models-")
+
+
+def tearDownModule():
+    shutil.rmtree(MODELS_DIR, ignore_errors=True)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class LoadKebeleCropsTests(TestCase):
+    """load_kebele_crops writes valid rows, reports the rest and only touches what changed."""
+
+    def csv(self, *rows):
+        header = ",".join(["kebele", "crop"] + KEBELE_CROP_FIELDS)
+        lines = [header] + [",".join([kebele, crop] + [value] * len(KEBELE_CROP_FIELDS)) for kebele, crop, value in rows]
+        return io.StringIO("\n".join(lines) + "\n")
+
+    def test_upsert_and_errors(self):
+        result = load_kebele_crops(self.csv(("k1", "Teff", "1.5"), ("k1", "Maize", "abc"), ("", "Teff", "2")))
+        self.assertEqual(result.loaded, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn("not a number ('abc')", result.errors[0][1])
+        self.assertIn("kebele: missing", result.errors[1][1])
+
+        # Loading again updates in place; a later duplicate wins
+        result = load_kebele_crops(self.csv(("k1", "Teff", "2.5"), ("k1", "Teff", "3.5"), ("k2", "Teff", "1")))
+        self.assertEqual(result.loaded, 2)
+        self.assertEqual(result.errors[0][0], 2)
+        self.assertEqual(sorted(KebeleCrop.objects.values_list("kebele", "crop", "ndvi_peak")),
+                         [("k1", "Teff", 3.5), ("k2", "Teff", 1.0)])
+
+    def test_reload_writes_only_the_difference(self):
+        load_kebele_crops(self.csv(("k1", "Teff", "1"), ("k1", "Maize", "2"), ("k2", "Teff", "3")))
+        unchanged = load_kebele_crops(self.csv(("k1", "Teff", "1"), ("k1", "Maize", "2"), ("k2", "Teff", "3")))
+        self.assertEqual((unchanged.loaded, len(unchanged.changes)), (0, 0))
+
+        result = load_kebele_crops(self.csv(("k1", "Teff", "1"), ("k2", "Teff", "4"), ("k3", "Teff", "5")),
+                                   chunk_size=2, delete_missing=True)
+        changes = result.changes
+        self.assertEqual((changes.inserted, changes.updated, changes.deleted),
+                         ([("k3", "Teff")], [("k2", "Teff")], [("k1", "Maize")]))
+        self.assertEqual(changes.kebele_ids, {"k1", "k2", "k3"})
+
+        # A row edited outside the loader is rewritten by the next load even if the file did not change
+        row = KebeleCrop.objects.get(kebele="k1", crop="Teff")
+        row.ndvi_peak = 9
+        row.save()
+        result = load_kebele_crops(self.csv(("k1", "Teff", "1"), ("k2", "Teff", "4"), ("k3", "Teff", "5")))
+        self.assertEqual(result.changes.updated, [("k1", "Teff")])
+        self.assertEqual(KebeleCrop.objects.get(kebele="k1", crop="Teff").ndvi_peak, 1.0)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class IngestFeaturesTests(TestCase):
+    """ingest_features averages the seasons of each (kebele, crop) and derives the missing Crop profiles."""
+
+    # Feature columns of each pipeline file, in AREA_FEATURES order
+    GROUPS = {"ndvi": AREA_FEATURES[:8], "rainfall": AREA_FEATURES[8:19],
+              "soil_moisture": AREA_FEATURES[19:23], "temperature": AREA_FEATURES[23:]}
+
+    def write_files(self, directory, seasons):
+        # seasons: (kebele, crop, value of every feature, whether NDVI was observed)
+        for group, filename in FEATURE_FILES.items():
+            rows = [{"crop": crop, "region": "Oromia", "kebele": kebele, "year": 2000 + i,
+                     **{c: value if group != "ndvi" or ndvi else "" for c in self.GROUPS[group]}}
+                    for i, (kebele, crop, value, ndvi) in enumerate(seasons)]
+            pd.DataFrame(rows).to_csv(os.path.join(directory, filename), index=False)
+
+    def test_ingest(self):
+        Crop.objects.create(name="Teff", **{f: 0 for f in CROP_FIELDS})
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_files(directory, [("k1", "Teff", 1, True), ("k1", "Teff", 3, True), ("k2", "Teff", 5, False),
+                                         ("k1", "Maize", 10, True), ("k2", "Maize", 30, True),
+                                         ("k3", "Sorghum", 7, False)])
+            result = ingest_features(directory)
+
+        self.assertEqual(result.read, 24)
+        # No NDVI for Sorghum anywhere; k2 / Teff gets the median over Teff's other kebeles
+        self.assertEqual(result.incomplete, [("k3", "Sorghum")])
+        self.assertEqual(sorted(KebeleCrop.objects.values_list("kebele", "crop", "ndvi_peak", "gdd_total")),
+                         [("k1", "Maize", 10.0, 10.0), ("k1", "Teff", 2.0, 2.0),
+                          ("k2", "Maize", 30.0, 30.0), ("k2", "Teff", 2.0, 5.0)])
+        self.assertTrue(Kebele.objects.filter(kebele_id="k2").exists())
+
+        # Only Maize had no profile; Teff's curated one is kept
+        self.assertEqual(result.crops, 1)
+        self.assertEqual(Crop.objects.get(name="Teff").gdd_total, 0)
+        maize = Crop.objects.get(name="Maize")
+        self.assertEqual((maize.seasonal_rainfall_total_min, maize.seasonal_rainfall_total_opt,
+                          maize.seasonal_rainfall_total_max), (12.0, 20.0, 28.0))
+
+        # The ingest is repeatable
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_files(directory, [("k1", "Teff", 4, True)])
+            ingest_features(directory, delete_missing=True)
+        self.assertEqual(list(KebeleCrop.objects.values_list("kebele", "crop", "gdd_total")), [("k1", "Teff", 4.0)])
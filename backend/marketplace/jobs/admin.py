@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'progress', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('worker', 'created_at', 'started_at', 'finished_at', 'updated_at')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.models import Job
+from jobs.queue import claim, fail_stale, run, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued jobs (data loads, rescoring, farmer matching) outside the web workers. "
+        "Start one or more of these next to the web server; they share the queue safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--max-jobs", type=int, help="Exit after running this many jobs.")
+        parser.add_argument("--stale-after", type=float,
+                            help="Fail running jobs with no progress for this many seconds (their worker died).")
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        ran = 0
+        self.stdout.write(f"Worker {worker} waiting for jobs.")
+        while options["max_jobs"] is None or ran < options["max_jobs"]:
+            close_old_connections()
+            if options["stale_after"]:
+                stale = fail_stale(options["stale_after"])
+                if stale:
+                    self.stderr.write(f"{stale} stale jobs marked as failed.")
+            job = claim(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+                continue
+            started = time.perf_counter()
+            job = run(job)
+            ran += 1
+            style = self.style.SUCCESS if job.status == Job.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style(f"{job} in {time.perf_counter() - started:.2f}s"))
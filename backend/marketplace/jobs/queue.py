@@ -0,0 +1,87 @@
+"""
+A small database-backed job queue.
+
+enqueue() inserts a Job row; `manage.py run_jobs` workers take the oldest
+queued one with a conditional UPDATE (queued -> running), so any number of
+workers can share the table without running a job twice and without a broker
+beyond the database itself.
+
+A task is a function registered with @task(name) (see tasks.py). It is called
+with a progress(fraction, message="") callback and the job's params as keyword
+arguments, and returns a JSON-serializable result. Progress is saved by its
+own UPDATE, so it shows up between the task's transactions, not inside one;
+tasks report it at stage boundaries.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    """Register the decorated function as the task called name."""
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+def enqueue(name, params=None, user=None) -> Job:
+    """Queue a run of task name with params (a JSON object); ValueError for an unknown task."""
+    if name not in TASKS:
+        raise ValueError(f"Unknown task: {name}")
+    if user is not None and not user.is_authenticated:
+        user = None
+    return Job.objects.create(task=name, params=params or {}, created_by=user)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker: str) -> Job | None:
+    """Mark the oldest queued job as running on worker and return it; None if the queue is empty."""
+    while True:
+        pk = Job.objects.filter(status=Job.QUEUED).order_by("id").values_list("id", flat=True).first()
+        if pk is None:
+            return None
+        now = timezone.now()
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, worker=worker, started_at=now, updated_at=now):
+            return Job.objects.get(pk=pk)
+        # another worker took it first; try the next one
+
+
+def run(job: Job) -> Job:
+    """Run a claimed job to completion and record its result or traceback."""
+    def progress(fraction, message=""):
+        Job.objects.filter(pk=job.pk).update(progress=max(0.0, min(float(fraction), 1.0)),
+                                             message=message[:255], updated_at=timezone.now())
+
+    try:
+        result = TASKS[job.task](progress, **job.params)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.task)
+        fields = {"status": Job.FAILED, "error": traceback.format_exc()}
+    else:
+        fields = {"status": Job.SUCCEEDED, "result": result, "progress": 1.0}
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(finished_at=now, updated_at=now, **fields)
+    job.refresh_from_db()
+    return job
+
+
+def fail_stale(seconds: float) -> int:
+    """Fail running jobs without a progress update for seconds (their worker died). Returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return Job.objects.filter(status=Job.RUNNING, updated_at__lt=cutoff).update(
+        status=Job.FAILED, error="Worker stopped responding.", finished_at=timezone.now())
@@ -0,0 +1,84 @@
+"""
+The tasks web requests hand to the run_jobs workers: data loads, rescoring and
+farmer matching for large regions. Each one gets a progress callback plus the job's params and
+returns a JSON result (see queue.py).
+"""
+from crop.ingest import ingest_features
+from crop.loaders import ChangeSet, load_crops, load_kebele_crops, refresh_changed
+from user.matches import match_farmers
+from user.models import CropRequirement, Kebele
+from user.recommender import refresh_recommendations, rescore, write_snapshot
+from .queue import task
+
+# Rejected rows listed in a load job's result
+ERRORS_IN_RESULT = 50
+
+
+def _load_result(result) -> dict:
+    return {"loaded": result.loaded, "read": result.read, "rejected": len(result.errors),
+            "errors": [f"line {line}: {reason}" for line, reason in result.errors[:ERRORS_IN_RESULT]]}
+
+
+@task("load_crops")
+def load_crops_task(progress, path, strict=False):
+    progress(0.0, "loading")
+    result = load_crops(path, strict=strict)
+    if strict and result.errors:
+        return _load_result(result)
+    progress(0.5, "refreshing recommendations")
+    written = refresh_recommendations()
+    return dict(_load_result(result), recommendations=written, snapshot=write_snapshot() is not None)
+
+
+@task("load_kebele_crops")
+def load_kebele_crops_task(progress, path, strict=False, delete_missing=False):
+    progress(0.0, "loading")
+    result = load_kebele_crops(path, strict=strict, delete_missing=delete_missing)
+    progress(0.5, "rescoring changed kebeles")
+    changes = result.changes or ChangeSet()
+    return dict(_load_result(result), rescored=refresh_changed(changes), inserted=len(changes.inserted),
+                updated=len(changes.updated), deleted=len(changes.deleted))
+
+
+@task("ingest_features")
+def ingest_features_task(progress, source_dir=None, crop_profiles="missing", delete_missing=False):
+    progress(0.0, "ingesting feature files")
+    result = ingest_features(source_dir, crop_profiles_mode=crop_profiles, delete_missing=delete_missing)
+    progress(0.5, "refreshing recommendations")
+    written = refresh_recommendations()
+    return {"read": result.read, "kebele_crops": result.kebele_crops, "crops": result.crops,
+            "deleted": result.deleted, "incomplete": len(result.incomplete), "timings": result.timings,
+            "recommendations": written, "snapshot": write_snapshot() is not None}
+
+
+@task("refresh_recommendations")
+def refresh_recommendations_task(progress, kebele_ids=None):
+    progress(0.0, "refreshing recommendations")
+    written = refresh_recommendations(kebele_ids)
+    result = {"recommendations": written}
+    if kebele_ids is None:
+        progress(0.8, "writing snapshot")
+        result["snapshot"] = write_snapshot() is not None
+    return result
+
+
+@task("rescore")
+def rescore_task(progress, kebele_ids=None, crops=None):
+    progress(0.0, "rescoring")
+    return rescore(kebele_ids, crops)
+
+
+@task("add_kebeles")
+def add_kebeles_task(progress, kebele_ids):
+    existing = set(Kebele.objects.filter(kebele_id__in=kebele_ids).values_list("kebele_id", flat=True))
+    created = [kebele_id for kebele_id in dict.fromkeys(kebele_ids) if kebele_id not in existing]
+    Kebele.objects.bulk_create([Kebele(kebele_id=kebele_id) for kebele_id in created], ignore_conflicts=True)
+    return {"created": created, "total": len(kebele_ids)}
+
+
+@task("match_requirement")
+def match_requirement_task(progress, requirement_id):
+    requirement = CropRequirement.objects.get(pk=requirement_id)
+    progress(0.0, f"matching farmers in {requirement.region}")
+    matched_farmers = match_farmers(requirement)
+    return {"requirement_id": requirement_id, "matched": len(matched_farmers), "matched_farmers": matched_farmers}
@@ -0,0 +1,79 @@
+import io
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from user.models import Kebele, User
+from user.views import test_add_kebeles
+from .models import Job
+from .queue import claim, enqueue, run
+from .views import job_detail_view, jobs_view
+
+
+# Snapshots and other MODELS_DIR artifacts the code under test writes go to a
+# scratch directory, never the developer's models/
+MODELS_DIR = tempfile.mkdtemp(prefix="shemeta-test-models-")
+
+
+def tearDownModule():
+    shutil.rmtree(MODELS_DIR, ignore_errors=True)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class JobQueueTests(TestCase):
+    """Heavy endpoints queue a job and answer 202; run_jobs runs it and the status endpoint reports it."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username="admin", password="x", is_staff=True)
+        self.farmer = User.objects.create_user(username="farmer", password="x", role="FARMER")
+
+    def detail(self, user, pk):
+        request = APIRequestFactory().get(f"/api/jobs/{pk}/")
+        force_authenticate(request, user=user)
+        return job_detail_view(request, job_id=pk)
+
+    def test_enqueue_run_and_status(self):
+        request = APIRequestFactory().post("/api/user/test/")
+        # Only staff can queue, and only with a POST
+        self.assertEqual(test_add_kebeles(request).status_code, 401)
+        force_authenticate(request, user=self.farmer)
+        self.assertEqual(test_add_kebeles(request).status_code, 403)
+        get = APIRequestFactory().get("/api/user/test/")
+        force_authenticate(get, user=self.staff)
+        self.assertEqual(test_add_kebeles(get).status_code, 405)
+        self.assertFalse(Job.objects.exists())
+
+        force_authenticate(request, user=self.staff)
+        response = test_add_kebeles(request)
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get()
+        self.assertEqual(response["Location"], f"/api/jobs/{job.pk}/")
+        self.assertEqual((job.status, Kebele.objects.count()), (Job.QUEUED, 0))
+
+        call_command("run_jobs", "--once", stdout=io.StringIO())
+        data = self.detail(self.staff, job.pk).data["job"]
+        self.assertEqual((data["status"], data["progress"]), (Job.SUCCEEDED, 1.0))
+        self.assertEqual(len(data["result"]["created"]), Kebele.objects.count())
+        # Other users' jobs are not visible
+        self.assertEqual(self.detail(self.farmer, job.pk).status_code, 404)
+
+    def test_staff_queue_and_failure(self):
+        request = APIRequestFactory().post("/api/jobs/", {"task": "rescore", "params": {"kebele_ids": ["k1"]}},
+                                           format="json")
+        force_authenticate(request, user=self.farmer)
+        self.assertEqual(jobs_view(request).status_code, 403)
+        force_authenticate(request, user=self.staff)
+        self.assertEqual(jobs_view(request).status_code, 202)
+
+        job = enqueue("add_kebeles", {"unknown": 1})
+        # Oldest first, and a claimed job is not handed out again
+        self.assertEqual(claim("w1").task, "rescore")
+        self.assertEqual(claim("w2").pk, job.pk)
+        self.assertIsNone(claim("w3"))
+        with self.assertLogs("jobs.queue", "ERROR"):
+            job = run(Job.objects.get(pk=job.pk))
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("unexpected keyword argument", job.error)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import jobs_view, job_detail_view
+
+urlpatterns = [
+    path('', jobs_view, name='jobs'),
+    path('<int:job_id>/', job_detail_view, name='job_detail'),
+]
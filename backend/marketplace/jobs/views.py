@@ -0,0 +1,76 @@
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from user.pagination import keyset_page, page_size
+from .models import Job
+from .queue import TASKS, enqueue
+
+
+def job_data(job):
+    return {
+        "id": job.id,
+        "task": job.task,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "url": f"/api/jobs/{job.id}/",
+    }
+
+
+def accepted(job, **extra):
+    """202 Accepted for a queued job (plus any extra fields), pointing at its status endpoint."""
+    data = job_data(job)
+    response = JsonResponse({"success": True, **extra, "job": data}, status=202)
+    response["Location"] = data["url"]
+    return response
+
+
+def visible_jobs(user):
+    return Job.objects.all() if user.is_staff else Job.objects.filter(created_by=user)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def jobs_view(request):
+    """
+    GET: the user's jobs (staff: everyone's), newest first, one page at a time
+    (?limit, ?cursor as in exporter_home; ?status and ?task filter).
+    POST (staff): {"task": ..., "params": {...}} queues a task from jobs.tasks and
+    answers 202 with the job; follow its url for status and progress.
+    """
+    if request.method == 'POST':
+        if not request.user.is_staff:
+            return Response({'success': False, 'message': 'Only staff can queue jobs.'}, status=403)
+        name, params = request.data.get('task'), request.data.get('params') or {}
+        if name not in TASKS or not isinstance(params, dict):
+            return Response({'success': False, 'message': f"task must be one of {', '.join(sorted(TASKS))} "
+                                                          "and params an object."}, status=400)
+        return accepted(enqueue(name, params, request.user))
+
+    jobs = visible_jobs(request.user)
+    for field in ('status', 'task'):
+        if request.query_params.get(field):
+            jobs = jobs.filter(**{field: request.query_params[field]})
+    try:
+        page, next_cursor = keyset_page(jobs, 'created_at', request.query_params.get('cursor'),
+                                        page_size(request.query_params.get('limit')))
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+    return Response({"success": True, "jobs": [job_data(job) for job in page], "next_cursor": next_cursor})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_detail_view(request, job_id):
+    """Status, progress and (once done) result or error of one job."""
+    job = visible_jobs(request.user).filter(pk=job_id).first()
+    if job is None:
+        return Response({'success': False, 'message': 'Job not found.'}, status=404)
+    return Response({"success": True, "job": job_data(job)})
@@ -0,0 +1,216 @@
+"""
+In-process request metrics, exposed in Prometheus text format at /api/metrics/.
+
+MetricsMiddleware records, per URL pattern of the API routes (user/urls.py,
+crop/urls.py and jobs/urls.py): wall time, DB query count and time, time spent
+in the matcher and response size, into fixed-bucket histograms. Each worker process keeps its own
+numbers; scrape every worker (or run one) to see all traffic.
+
+settings.METRICS_MODE:
+  "full"   everything above (a wrapper runs around every DB query)
+  "light"  wall time, response size and request counts only: a few
+           perf_counter calls per request, nothing per query
+  "off"    the middleware removes itself
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+PREFIX = "shemeta"
+ROUTE_PREFIXES = ("api/user/", "api/crop/", "api/jobs/")
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def mode() -> str:
+    return getattr(settings, "METRICS_MODE", "full")
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "n")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot: above the highest bound
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+class Registry:
+    """Histograms keyed by (metric, route) and request counters by (route, method, status)."""
+
+    HISTOGRAMS = {
+        "request_duration_seconds": ("Wall time of the request.", SECONDS),
+        "response_size_bytes": ("Size of the response body.", BYTES),
+        "db_queries": ("Database queries issued by the request.", QUERIES),
+        "db_duration_seconds": ("Time spent in database queries.", SECONDS),
+        "matcher_duration_seconds": ("Time spent in the crop matcher.", SECONDS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+
+    def record(self, route, method, status, values: dict):
+        with self.lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in values.items():
+                histogram = self.histograms.get((name, route))
+                if histogram is None:
+                    histogram = self.histograms[(name, route)] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def render(self) -> str:
+        with self.lock:
+            lines = [
+                f"# HELP {PREFIX}_requests_total Requests served.",
+                f"# TYPE {PREFIX}_requests_total counter",
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'{PREFIX}_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                routes = sorted(route for metric, route in self.histograms if metric == name)
+                if not routes:
+                    continue
+                lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} histogram"]
+                for route in routes:
+                    h = self.histograms[(name, route)]
+                    cumulative = 0
+                    for bound, count in zip(list(h.bounds) + ["+Inf"], h.counts):
+                        cumulative += count
+                        lines.append(f'{PREFIX}_{name}_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{PREFIX}_{name}_sum{{route="{route}"}} {h.total}')
+                    lines.append(f'{PREFIX}_{name}_count{{route="{route}"}} {h.n}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "matcher_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.matcher_seconds = 0.0
+
+
+# Stats of the request being served; copied into sync_to_async threads with the rest of the context
+current = ContextVar("request_stats", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextmanager
+def timed_matcher():
+    """Attribute the enclosed time to the matcher in the current request's metrics."""
+    stats = current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.matcher_seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = mode()
+        if self.mode == "off":
+            raise MiddlewareNotUsed
+        if self.mode == "full":
+            connection_created.connect(_install_query_counter, dispatch_uid="metrics_query_counter")
+            for connection in connections.all(initialized_only=True):
+                _install_query_counter(None, connection)
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    def start(self):
+        stats = RequestStats() if self.mode == "full" else None
+        return stats, current.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        if match is None or not match.route.startswith(ROUTE_PREFIXES):
+            return
+        values = {"request_duration_seconds": elapsed}
+        if not response.streaming:
+            values["response_size_bytes"] = len(response.content)
+        if stats is not None:
+            values.update(
+                db_queries=stats.queries,
+                db_duration_seconds=stats.db_seconds,
+                matcher_duration_seconds=stats.matcher_seconds,
+            )
+        registry.record(match.route, request.method, response.status_code, values)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """Prometheus text exposition of this process's request metrics (staff only)."""
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
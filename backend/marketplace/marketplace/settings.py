@@ -15,6 +15,12 @@ from pathlib import Path
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Fitted artifacts (scrapers/cluster.py outputs, kebele neighbour index) live in <repo>/models
+MODELS_DIR = BASE_DIR.parent.parent / 'models'
+
+# Feature CSVs written by scrapers/pipeline.py (read by the ingest_features command)
+FEATURES_DIR = BASE_DIR.parent.parent
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -33,6 +39,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     'user',
     'crop',
+    'jobs',
     'rest_framework',
 'rest_framework_simplejwt.token_blacklist',
     'django.contrib.admin',
@@ -49,6 +56,7 @@ REST_FRAMEWORK = {
     ),
 }
 MIDDLEWARE = [
+    'marketplace.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
         'corsheaders.middleware.CorsMiddleware',
 
@@ -131,3 +139,6 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Request metrics at /api/metrics/: "full", "light" (no per-query accounting) or "off"
+METRICS_MODE = 'full'
@@ -17,8 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/',include('user.urls')),
     path('api/crop/',include('crop.urls')),
+    path('api/jobs/',include('jobs.urls')),
+    path('api/metrics/', metrics_view),
 ]
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import LandDetail,User,Kebele
+from .models import LandDetail,User,Kebele,KebeleRecommendation
 # Register your models here.
 admin.site.register(LandDetail)
 admin.site.register(User)
-admin.site.register(Kebele)
\ No newline at end of file
+admin.site.register(Kebele)
+admin.site.register(KebeleRecommendation)
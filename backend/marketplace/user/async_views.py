@@ -0,0 +1,123 @@
+"""
+Async variants of the dashboard endpoints, for serving under marketplace.asgi.
+
+DRF function views are sync-only, so these are plain Django async views that
+authenticate the JWT themselves and reuse the query/serialization helpers of the
+sync views. Independent queries run concurrently, each in its own worker thread
+(and so on its own database connection); CPU-heavy work (the neighbour lookups
+behind borrowed recommendations) runs on a bounded thread pool so it cannot
+starve the event loop. One ASGI worker can then keep many slow clients in flight.
+"""
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .pagination import keyset_page, page_size
+from .views import (
+    exporter_querysets, farmer_lands, farmer_matches, farmer_recommendations, kebele_locations,
+    matches_data, requirements_data,
+)
+
+# Matcher / neighbour-index work; sized to the cores it can actually use
+CPU_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="matcher")
+
+
+def _recycled(fn, *args):
+    """
+    fn(*args) as a callable for a worker thread. The thread's connection is recycled
+    by the same rules as a request's (CONN_MAX_AGE, broken connections).
+    """
+    def run():
+        close_old_connections()
+        try:
+            return fn(*args)
+        finally:
+            close_old_connections()
+    return run
+
+
+def _in_thread(fn, *args):
+    """Run fn(*args) in a worker thread of its own, so it can overlap other queries."""
+    return sync_to_async(_recycled(fn, *args), thread_sensitive=False)()
+
+
+def _in_cpu_pool(fn, *args):
+    # run_in_executor does not carry the context over (request metrics live there)
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(CPU_EXECUTOR, context.run, _recycled(fn, *args))
+
+
+async def _authenticate(request):
+    """The JWT user, or None when the request carries no valid token."""
+    try:
+        result = await _in_thread(JWTAuthentication().authenticate, request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+def _unauthorized():
+    return _response({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+@require_GET
+async def farmer_home_async_view(request):
+    """Async farmer_home: lands and matches are fetched concurrently, then the recommendations."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    land_details_data, matches = await asyncio.gather(
+        _in_thread(farmer_lands, user),
+        _in_thread(farmer_matches, user),
+    )
+    recommendations = await _in_cpu_pool(farmer_recommendations, kebele_locations(land_details_data))
+    return _response({
+        "success": True,
+        "land_details": land_details_data,
+        "recommendations": recommendations,
+        "matches": matches,
+    })
+
+
+@require_GET
+async def exporter_home_async_view(request):
+    """Async exporter_home: both pages and both totals are fetched concurrently."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    params = request.GET
+    requirements, matches = exporter_querysets(user, params)
+    try:
+        limit = page_size(params.get('limit'))
+        (requirement_page, next_requirements), (match_page, next_matches), total_requirements, total_matches = \
+            await asyncio.gather(
+                _in_thread(keyset_page, requirements, 'created_at', params.get('requirements_cursor'), limit),
+                _in_thread(keyset_page, matches, 'matched_on', params.get('matches_cursor'), limit),
+                _in_thread(requirements.count),
+                _in_thread(matches.count),
+            )
+    except ValueError as e:
+        return _response({'success': False, 'message': str(e)}, status=400)
+    return _response({
+        "success": True,
+        "requirements": requirements_data(requirement_page),
+        "matches": matches_data(match_page),
+        "total_requirements": total_requirements,
+        "total_matches": total_matches,
+        "next_requirements_cursor": next_requirements,
+        "next_matches_cursor": next_matches,
+    })
@@ -0,0 +1,132 @@
+"""
+Synthetic data and timing helpers for benchmarking the matcher
+(see the bench_matcher management command).
+
+Crop profiles and KebeleCrop instances are drawn uniformly from the ranges
+observed in the shipped Crop / KebeleCrop data, so distances, pruning rates and
+ranking work look like production rather than like random noise.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .matcher import AreaInstances, CropEnvMatcherForKebele, AREA_FEATURES, CROP_FEATURES
+
+# (low, high) per Crop column; the *_min / *_max columns are derived from *_opt below
+CROP_RANGES = {
+    "ndvi_peak": (0.64, 0.90), "ndvi_scale": (1.0, 1.0), "ndvi_seasonal_avg": (0.44, 0.68),
+    "ndvi_start_of_season": (60, 315), "ndvi_end_of_season": (200, 365),
+    "ndvi_integral": (58, 260), "ndvi_threshold": (0.24, 0.35), "ndvi_anomaly_avg": (0.08, 0.12),
+    "seasonal_rainfall_total_opt": (400, 1800),
+    "onset_date": (50, 310), "cessation_date": (80, 340),
+    "rainy_days_count": (1, 7), "dry_spell_days": (0, 60),
+    "onset_delay_days": (10, 90), "onset_threshold": (10, 50), "rainy_day_threshold": (1, 1),
+    "dry_spell_threshold": (3, 60), "rainfall_std_dev": (50, 90), "rainfall_skewness": (-0.1, 0.3),
+    "data_quality_flag": (0.75, 0.85),
+    "mean_soil_moisture": (40, 80), "dry_soil_days": (0, 60), "dry_threshold": (30, 60), "soil_moisture_std": (5, 10),
+    "mean_temp_season_min": (5, 25), "max_temp_avg": (27, 45), "min_temp_avg": (0, 15),
+    "gdd_total": (1200, 3000), "gdd_base_temp": (5, 10), "heatwave_days": (2, 7), "heatwave_threshold": (30, 40),
+}
+
+# (low, high) per KebeleCrop column
+AREA_RANGES = {
+    "ndvi_peak": (0.31, 0.57), "ndvi_scale": (0.31, 0.57), "ndvi_seasonal_avg": (0.26, 0.48),
+    "ndvi_start_of_season": (10, 176), "ndvi_end_of_season": (237, 330),
+    "ndvi_integral": (1.8, 9.5), "ndvi_threshold": (0.22, 0.44), "ndvi_anomaly_avg": (-0.17, 0.15),
+    "seasonal_rainfall_total": (270, 1220), "onset_date": (1, 169), "cessation_date": (166, 283),
+    "rainy_days_count": (11, 46), "dry_spell_days": (26, 100),
+    "onset_delay_days": (0, 17), "onset_threshold": (0, 23.5), "rainy_day_threshold": (8.8, 13.2),
+    "dry_spell_threshold": (8.8, 13.2), "rainfall_std_dev": (68, 301), "rainfall_skewness": (-2.05, 1.13),
+    "mean_soil_moisture": (11.2, 16.7), "dry_soil_days": (4.8, 9.0), "dry_threshold": (2.6, 6.8),
+    "soil_moisture_std": (2.6, 3.9),
+    "mean_temp_season": (16.0, 17.7), "max_temp_avg": (21.3, 23.5), "min_temp_avg": (10.5, 11.9),
+    "gdd_total": (107, 594), "gdd_base_temp": (14.8, 17.0), "heatwave_days": (7.4, 15.8),
+    "heatwave_threshold": (24.4, 26.8),
+}
+
+
+def synthetic_crops(n_crops: int, seed: int = 0) -> pd.DataFrame:
+    """n_crops crop profiles in the shape CropEnvMatcherForKebele.fit expects."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({f: rng.uniform(lo, hi, n_crops) for f, (lo, hi) in CROP_RANGES.items()})
+    opt = df["seasonal_rainfall_total_opt"]
+    df["seasonal_rainfall_total_min"] = opt * rng.uniform(0.4, 0.8, n_crops)
+    df["seasonal_rainfall_total_max"] = opt * rng.uniform(1.3, 3.0, n_crops)
+    df["mean_temp_season_max"] = df["mean_temp_season_min"] + rng.uniform(5, 15, n_crops)
+    df.insert(0, "crop", [f"crop-{i:03d}" for i in range(n_crops)])
+    return df[["crop"] + CROP_FEATURES]
+
+
+def synthetic_rows(crop_names, n_kebeles: int, crops_per_kebele: int = 25,
+                   instances_per_crop: int = 3, seed: int = 0) -> list[tuple]:
+    """
+    KebeleCrop-like rows (kebele, crop, *AREA_FEATURES): each kebele grows
+    crops_per_kebele of the crops, with instances_per_crop rows (seasons) each.
+    """
+    rng = np.random.default_rng(seed)
+    crops_per_kebele = min(crops_per_kebele, len(crop_names))
+    per_kebele = crops_per_kebele * instances_per_crop
+    n = n_kebeles * per_kebele
+    crop_idx = np.concatenate([
+        np.repeat(rng.choice(len(crop_names), crops_per_kebele, replace=False), instances_per_crop)
+        for _ in range(n_kebeles)
+    ])
+    kebeles = np.repeat([f"kebele-{i:05d}" for i in range(n_kebeles)], per_kebele)
+    crops = np.asarray(crop_names, dtype=object)[crop_idx]
+    columns = [rng.uniform(lo, hi, n).tolist() for lo, hi in (AREA_RANGES[f] for f in AREA_FEATURES)]
+    return list(zip(kebeles.tolist(), crops.tolist(), *columns))
+
+
+def fitted_matcher(crop_df: pd.DataFrame) -> CropEnvMatcherForKebele:
+    return CropEnvMatcherForKebele().fit(crop_df)
+
+
+def area(rows) -> AreaInstances:
+    """Rows from synthetic_rows as the matcher input the recommender builds."""
+    return AreaInstances.from_values_list(rows, quality=1.0)
+
+
+def measure(fn, repeat: int, items: int = 1) -> dict:
+    """
+    Call fn() repeat times (after one warm-up call): p50/p99 latency in ms,
+    throughput in items/s (items processed per call), and the peak traced
+    allocation of a single call in MB.
+    """
+    fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    latencies = np.array(latencies)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "throughput": float(items * len(latencies) / latencies.sum()),
+        "peak_mb": peak / 2**20,
+        "repeat": repeat,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """
+    Benchmarks whose p50 latency grew by more than tolerance (relative) against
+    baseline, as readable lines. Both are {name: measure() dict}.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before["p50_ms"]:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1.0
+        if change > tolerance:
+            regressions.append(f"{name}: p50 {before['p50_ms']:.2f}ms -> {result['p50_ms']:.2f}ms (+{change:.0%})")
+    return regressions
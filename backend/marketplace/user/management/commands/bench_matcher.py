@@ -0,0 +1,148 @@
+import itertools
+import json
+import platform
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test import override_settings
+
+from user import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the matcher on synthetic crops/kebeles: fit, query_kebele (per kebele), "
+        "query_kebeles (batch) and optionally the load_recommendations view end to end. "
+        "Reports p50/p99 latency, throughput and peak memory; --out saves JSON that a "
+        "later run can be checked against with --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kebeles", type=int, nargs="+", default=[10, 100, 1000, 10000])
+        parser.add_argument("--crops", type=int, nargs="+", default=[16, 200])
+        parser.add_argument("--crops-per-kebele", type=int, default=25)
+        parser.add_argument("--instances", type=int, default=3,
+                            help="Instances (seasons) per kebele crop (matcher runs; --view uses one).")
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--samples", type=int, default=50, help="Kebeles cycled through for query_kebele.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--view", action="store_true",
+                            help="Also time load_recommendations on a throwaway test database.")
+        parser.add_argument("--view-kebeles", type=int, default=100)
+        parser.add_argument("--out", help="Write results as JSON to this file.")
+        parser.add_argument("--baseline", help="Fail if p50 regressed against this JSON results file.")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p50 slowdown.")
+
+    def handle(self, *args, **options):
+        repeat, seed = options["repeat"], options["seed"]
+        results = {}
+        for n_crops in options["crops"]:
+            crop_df = bench.synthetic_crops(n_crops, seed)
+            results[f"fit/crops={n_crops}"] = self.report(
+                f"fit/crops={n_crops}", bench.measure(lambda: bench.fitted_matcher(crop_df), repeat)
+            )
+            matcher = bench.fitted_matcher(crop_df)
+            for n_kebeles in options["kebeles"]:
+                rows = bench.synthetic_rows(crop_df["crop"].tolist(), n_kebeles, options["crops_per_kebele"],
+                                            options["instances"], seed)
+                area = bench.area(rows)
+                per_kebele = len(area) // n_kebeles
+                sample = itertools.cycle([
+                    area.take(slice(i * per_kebele, (i + 1) * per_kebele))
+                    for i in range(min(options["samples"], n_kebeles))
+                ])
+                name = f"query_kebele/crops={n_crops}/kebeles={n_kebeles}"
+                results[name] = self.report(name, bench.measure(lambda: matcher.query_kebele(next(sample)), repeat))
+                name = f"query_kebeles/crops={n_crops}/kebeles={n_kebeles}"
+                results[name] = self.report(name, bench.measure(
+                    lambda: matcher.query_kebeles(area, max_distance=float("inf")), repeat, items=n_kebeles
+                ))
+        if options["view"]:
+            results.update(self.bench_view(options["view_kebeles"], options, repeat, seed))
+
+        payload = {
+            "meta": {
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "machine": platform.machine(),
+                "options": {k: options[k] for k in ("kebeles", "crops", "crops_per_kebele", "instances",
+                                                    "repeat", "samples", "seed")},
+            },
+            "results": results,
+        }
+        if options["out"]:
+            with open(options["out"], "w") as f:
+                json.dump(payload, f, indent=2)
+            self.stdout.write(f"Results written to {options['out']}.")
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)["results"]
+            regressions = bench.compare(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<45} p50 {result['p50_ms']:9.2f}ms  p99 {result['p99_ms']:9.2f}ms  "
+            f"{result['throughput']:10.1f}/s  peak {result['peak_mb']:8.1f}MB"
+        )
+        return result
+
+    def bench_view(self, n_kebeles, options, repeat, seed):
+        """load_recommendations (stored and ?explain=1) against synthetic rows in a test database."""
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from crop.models import Crop, KebeleCrop
+        from user.models import Kebele
+        from user.recommender import invalidate_crop_matrix, refresh_recommendations
+        from user.views import load_recommendations
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Version tokens and snapshots too: the synthetic loads must not invalidate the real ones
+        models_dir = tempfile.mkdtemp(prefix="shemeta-bench-models-")
+        override = override_settings(MODELS_DIR=models_dir)
+        override.enable()
+        try:
+            # 31 crops, like the shipped Crop table
+            crop_df = bench.synthetic_crops(31, seed)
+            integer = {f.name for f in Crop._meta.fields if isinstance(f, models.IntegerField)}
+            Crop.objects.bulk_create([
+                Crop(name=row.pop("crop"), **{k: round(v) if k in integer else v for k, v in row.items()})
+                for row in crop_df.to_dict(orient="records")
+            ])
+            fields = ["kebele_id", "crop_id"] + bench.AREA_FEATURES
+            # KebeleCrop holds one profile per kebele and crop, so a single instance each
+            rows = bench.synthetic_rows(crop_df["crop"].tolist(), n_kebeles, options["crops_per_kebele"], 1, seed)
+            Kebele.objects.bulk_create([Kebele(kebele_id=k) for k in sorted({row[0] for row in rows})])
+            KebeleCrop.objects.bulk_create([KebeleCrop(**dict(zip(fields, row))) for row in rows], batch_size=1000)
+            invalidate_crop_matrix()
+            refresh_recommendations()
+
+            factory, user = APIRequestFactory(), get_user_model()(username="bench")
+            kebeles = itertools.cycle(sorted({row[0] for row in rows}))
+
+            def call(query=""):
+                request = factory.get(f"/api/user/load_recommendations/?kebele_id={next(kebeles)}{query}")
+                force_authenticate(request, user=user)
+                response = load_recommendations(request)
+                response.render()
+                assert response.status_code == 200, response.status_code
+
+            results = {}
+            for name, query in ((f"view/stored/kebeles={n_kebeles}", ""),
+                                (f"view/explain/kebeles={n_kebeles}", "&explain=1")):
+                results[name] = self.report(name, bench.measure(lambda: call(query), repeat))
+            return results
+        finally:
+            override.disable()
+            shutil.rmtree(models_dir, ignore_errors=True)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.neighbors import KebeleNeighborIndex
+from user.recommender import invalidate_recommendations
+
+
+class Command(BaseCommand):
+    help = "Build the kebele similarity index from KebeleCrop (and LandDetail locations) and save it under MODELS_DIR."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", help="Save to this path instead of MODELS_DIR/kebele_neighbors.joblib.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = KebeleNeighborIndex.build()
+        path = index.save(options["out"])
+        # Borrowed recommendations in cached responses came from the old index
+        invalidate_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} kebeles ({len(index.geo_kebele_ids)} with coordinates) "
+            f"in {time.perf_counter() - started:.2f}s -> {path}"
+        ))
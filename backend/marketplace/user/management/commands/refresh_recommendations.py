@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from user.recommender import SNAPSHOT_SKIPPED, refresh_recommendations, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Recompute the KebeleRecommendation table from Crop and KebeleCrop (and, for all kebeles, the snapshot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kebele_ids", nargs="*", help="Only refresh these kebeles (default: all).")
+        parser.add_argument("--no-snapshot", action="store_true",
+                            help="Do not write a new recommendation snapshot after a full refresh.")
+
+    def handle(self, *args, **options):
+        written = refresh_recommendations(options["kebele_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"{written} recommendations written."))
+        if not options["kebele_ids"] and not options["no_snapshot"]:
+            snapshot = write_snapshot()
+            if snapshot is None:
+                self.stdout.write(self.style.WARNING(SNAPSHOT_SKIPPED))
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f"Snapshot of {len(snapshot)} instances in {len(snapshot.kebele_names)} kebeles -> {snapshot.path}"
+            ))
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from crop.models import KebeleCrop
+from user.models import Kebele
+from user.recommender import data_version
+
+MANIFEST = "_manifest.json"
+
+
+def _init_worker():
+    # Spawned workers start from a bare interpreter; forked ones already have Django
+    # set up and must not reuse the parent's database connections.
+    django.setup()
+    connections.close_all()
+
+
+def _score_shard(task):
+    """Score one shard of kebeles into <out>/shard=<n>.parquet (written to a temp file, then renamed)."""
+    from user.recommender import suitability_frame
+
+    shard, kebele_ids, out_dir = task
+    started = time.perf_counter()
+    path = os.path.join(out_dir, f"shard={shard:05d}.parquet")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df = suitability_frame(kebele_ids)
+    df["distance"] = df["distance"].astype("float32")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return shard, len(df), time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Score every kebele against every crop and write the suitability matrix as "
+        "parquet shards (one file per shard of kebeles). Existing shards are skipped, "
+        "so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default=str(settings.BASE_DIR / "suitability"),
+                            help="Output directory (default: <BASE_DIR>/suitability).")
+        parser.add_argument("--shard-size", type=int, default=500, help="Kebeles per shard.")
+        parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes.")
+        parser.add_argument("--restart", action="store_true", help="Delete existing shards and start over.")
+
+    def handle(self, *args, **options):
+        out_dir, shard_size = options["out"], options["shard_size"]
+        if shard_size < 1:
+            raise CommandError("--shard-size must be positive.")
+        os.makedirs(out_dir, exist_ok=True)
+
+        # Every kebele we know of; kebeles without KebeleCrop rows just produce no rows
+        kebele_ids = sorted(
+            set(KebeleCrop.objects.values_list("kebele", flat=True).distinct())
+            | set(Kebele.objects.values_list("kebele_id", flat=True))
+        )
+        shards = [kebele_ids[i:i + shard_size] for i in range(0, len(kebele_ids), shard_size)]
+
+        # Shard numbers only mean the same kebeles if the sharding did not change, and
+        # finished shards only hold current scores if no Crop / KebeleCrop data did
+        # (every load moves the data version)
+        manifest_path = os.path.join(out_dir, MANIFEST)
+        manifest = {
+            "shard_size": shard_size, "kebeles": len(kebele_ids), "shards": len(shards),
+            "kebele_ids_sha256": hashlib.sha256("\n".join(kebele_ids).encode()).hexdigest(),
+            "data_version": data_version(),
+        }
+        if options["restart"]:
+            for name in os.listdir(out_dir):
+                if name.startswith("shard=") or name == MANIFEST:
+                    os.remove(os.path.join(out_dir, name))
+        elif os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                previous = json.load(f)
+            if previous != manifest:
+                raise CommandError(
+                    f"{out_dir} holds a run with {previous}, this one would be {manifest}; "
+                    "use --restart or another --out."
+                )
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+        done = {name for name in os.listdir(out_dir) if name.endswith(".parquet")}
+        tasks = [
+            (n, shard, out_dir) for n, shard in enumerate(shards)
+            if f"shard={n:05d}.parquet" not in done
+        ]
+        self.stdout.write(
+            f"{len(kebele_ids)} kebeles in {len(shards)} shards, "
+            f"{len(shards) - len(tasks)} already done, {len(tasks)} to score "
+            f"on {options['processes']} processes."
+        )
+        if not tasks:
+            return
+
+        # Children must open their own connections
+        connections.close_all()
+        started = time.perf_counter()
+        rows = 0
+        with Pool(options["processes"], initializer=_init_worker) as pool:
+            for finished, (shard, n_rows, seconds) in enumerate(pool.imap_unordered(_score_shard, tasks), start=1):
+                rows += n_rows
+                elapsed = time.perf_counter() - started
+                eta = elapsed / finished * (len(tasks) - finished)
+                self.stdout.write(
+                    f"[{finished}/{len(tasks)}] shard {shard:05d}: {n_rows} rows in {seconds:.1f}s "
+                    f"(elapsed {elapsed:.0f}s, eta {eta:.0f}s)"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"{rows} kebele-crop scores written to {out_dir} in {time.perf_counter() - started:.1f}s."
+        ))
@@ -1,7 +1,8 @@
 # pip install pandas numpy
+import time
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 
 # -----------------------------
 # Penalty helpers
@@ -34,6 +35,52 @@ def window_distance(doy, start, end, wrap=365):
 
 def clamp_pos(x): return max(0.0, float(x))
 
+# -----------------------------
+# Vectorized penalty helpers (elementwise, same rules as above)
+# -----------------------------
+# np.fmax/np.fmin are used instead of np.maximum/np.minimum because, like the
+# builtin max(const, x), they return the constant when x is NaN.
+def range_penalty_v(x, xmin, xopt, xmax, w_in=1.0, w_under=2.0, w_over=1.8):
+    """Array version of range_penalty."""
+    span = np.fmax(1e-6, xmax - xmin)
+    return np.where(x < xmin, w_under * (xmin - x) / span,
+           np.where(x > xmax, w_over * (x - xmax) / span,
+                    w_in * np.abs(x - xopt) / span))
+
+def window_distance_v(doy, start, end, wrap=365):
+    """Array version of window_distance (DOYs truncated like int())."""
+    doy, start, end = np.trunc(doy), np.trunc(start), np.trunc(end)
+    inside = np.where(start <= end,
+                      (start <= doy) & (doy <= end),
+                      (doy >= start) | (doy <= end))
+    return np.where(inside, 0.0, np.fmin(np.mod(start - doy, wrap), np.mod(doy - end, wrap)))
+
+def clamp_pos_v(x): return np.fmax(0.0, x)
+
+def _quality(A):
+    """data_quality_flag as float64 clipped to [0, 1]; instances without a flag (NaN) get 0, i.e. no nudge."""
+    return np.clip(np.nan_to_num(np.asarray(A["data_quality_flag"], dtype=np.float64), nan=0.0), 0.0, 1.0)
+
+class _Take:
+    """Feature mapping restricted to rows idx; columns are gathered on access."""
+    __slots__ = ("data", "idx")
+
+    def __init__(self, data, idx):
+        self.data, self.idx = data, idx
+
+    def __getitem__(self, key):
+        return self.data[key][self.idx]
+
+def _grouped_argmin(groups: np.ndarray, values: np.ndarray):
+    """
+    Per-group minimum in one sort: returns (group ids ascending, index of the first
+    minimal value of each group) — same tie-breaking as np.argmin over each group.
+    """
+    order = np.lexsort((values, groups))  # stable: ties keep input order
+    g_sorted = groups[order]
+    first = np.flatnonzero(np.r_[True, g_sorted[1:] != g_sorted[:-1]])
+    return g_sorted[first], order[first]
+
 # -----------------------------
 # Feature groups (CSV side)
 # -----------------------------
@@ -60,6 +107,27 @@ TEMP_CROP_FEATURES = [
     "gdd_total","gdd_base_temp","heatwave_days","heatwave_threshold"
 ]
 
+CROP_FEATURES = NDVI_CROP_FEATURES + RAINFALL_CROP_FEATURES + SOIL_MOIST_CROP_FEATURES + TEMP_CROP_FEATURES
+
+# -----------------------------
+# Feature groups (area / kebele side)
+# -----------------------------
+AREA_FEATURES = NDVI_CROP_FEATURES + [
+    "seasonal_rainfall_total","onset_date","cessation_date",
+    "rainy_days_count","dry_spell_days",
+    "onset_delay_days","onset_threshold","rainy_day_threshold","dry_spell_threshold",
+    "rainfall_std_dev","rainfall_skewness"
+] + SOIL_MOIST_CROP_FEATURES + [
+    "mean_temp_season","max_temp_avg","min_temp_avg",
+    "gdd_total","gdd_base_temp","heatwave_days","heatwave_threshold"
+]
+
+PENALTY_GROUPS = ["p_ndvi", "p_rain", "p_soil", "p_t_mean", "p_text", "p_gdd", "p_heat"]
+
+# Unweighted penalty components; the distance is linear in them (see weight_coefficients)
+COMPONENTS = ["ndvi", "rain_total", "sow", "rainy_min", "dry", "onset", "var",
+              "soil", "t_mean", "text", "gdd", "heat"]
+
 # -----------------------------
 # Weights (tune as needed)
 # -----------------------------
@@ -81,6 +149,98 @@ class Weights:
     # area data quality (optional nudge 0..1)
     area_quality_alpha: float = 0.0
 
+def weight_coefficients(weights: list["Weights"]) -> np.ndarray:
+    """
+    (len(weights) x len(COMPONENTS)) matrix of the coefficient each configuration puts
+    on each component: the rainfall sub-terms are scaled by their own weight AND by
+    the rainfall group weight.
+    """
+    return np.array([[
+        w.ndvi,
+        w.rainfall,
+        w.rainfall * w.sow_window,
+        w.rainfall * w.rainy_days_min,
+        w.rainfall * w.dry_spells,
+        w.rainfall * w.onset_dynamics,
+        w.rainfall * w.variability,
+        w.soil_moisture,
+        w.temperature_mean,
+        w.temperature_extremes,
+        w.gdd,
+        w.heatwaves,
+    ] for w in weights], dtype=np.float64)
+
+def _encode(values):
+    """Integer codes for values (first-seen order) and the list of distinct values."""
+    vocab = {}
+    codes = np.fromiter((vocab.setdefault(v, len(vocab)) for v in values), dtype=np.intp)
+    return codes, list(vocab)
+
+class AreaInstances:
+    """
+    Columnar area instances: one float array per AREA_FEATURES entry plus
+    data_quality_flag (NaN = no flag), and integer crop / kebele codes into the
+    crop_names / kebele_names vocabularies. area[feature] returns the column, so
+    the vectorized kernel consumes it directly.
+
+    When the kernel columns are float32, exact holds the same columns as float64
+    (the source values): the matcher rescores each winning instance and echoes its
+    area fields from them, so only the bulk scoring sees the rounding.
+    """
+    __slots__ = ("columns", "crop", "crop_names", "kebele", "kebele_names", "exact")
+
+    def __init__(self, columns: dict, crop: np.ndarray, crop_names: list,
+                 kebele: np.ndarray | None = None, kebele_names: list | None = None, exact: dict | None = None):
+        self.columns = columns
+        self.crop, self.crop_names = crop, crop_names
+        if kebele is None:
+            kebele, kebele_names = np.zeros(len(crop), dtype=np.intp), [None]
+        self.kebele, self.kebele_names = kebele, kebele_names
+        self.exact = exact
+
+    def __len__(self):
+        return len(self.crop)
+
+    def __getitem__(self, feature):
+        return self.columns[feature]
+
+    def exact_columns(self) -> dict:
+        """The float64 source columns (the kernel columns when those are not reduced)."""
+        return self.columns if self.exact is None else self.exact
+
+    def take(self, idx) -> "AreaInstances":
+        """Subset of the instances (same vocabularies)."""
+        exact = None if self.exact is None else {k: v[idx] for k, v in self.exact.items()}
+        return AreaInstances({k: v[idx] for k, v in self.columns.items()},
+                             self.crop[idx], self.crop_names, self.kebele[idx], self.kebele_names, exact)
+
+    @classmethod
+    def from_values_list(cls, rows, quality: float | None = None, dtype=np.float32) -> "AreaInstances":
+        """
+        Build from tuples (kebele, crop, *AREA_FEATURES[, data_quality_flag]), e.g.
+        KebeleCrop.objects.values_list("kebele", "crop", *AREA_FEATURES).
+        quality is the flag for every instance when the rows carry none. With a
+        dtype other than float64 the float64 values are kept as exact.
+        """
+        cols = list(zip(*rows)) or [()] * (2 + len(AREA_FEATURES))
+        kebele, kebele_names = _encode(cols[0])
+        crop, crop_names = _encode(cols[1])
+        exact = {f: np.array(cols[i], dtype=np.float64) for i, f in enumerate(AREA_FEATURES, start=2)}
+        if len(cols) > 2 + len(AREA_FEATURES):
+            exact["data_quality_flag"] = np.array(cols[-1], dtype=np.float64)
+        else:
+            exact["data_quality_flag"] = np.full(len(crop), np.nan if quality is None else quality)
+        if np.dtype(dtype) == np.float64:
+            return cls(exact, crop, crop_names, kebele, kebele_names)
+        columns = {f: v.astype(dtype) for f, v in exact.items()}
+        return cls(columns, crop, crop_names, kebele, kebele_names, exact)
+
+    @classmethod
+    def from_dicts(cls, area_instances: list[dict], dtype=np.float64) -> "AreaInstances":
+        """Build from area dicts ("crop", optional "kebele" and the area features)."""
+        keys = ("kebele", "crop", *AREA_FEATURES, "data_quality_flag")
+        return cls.from_values_list([tuple(d.get(k) for k in keys) for d in area_instances], dtype=dtype)
+
 class CropEnvMatcherForKebele:
     """
     For each crop in crop_df, evaluate compatibility against matching area instances
@@ -90,14 +250,19 @@ class CropEnvMatcherForKebele:
     def __init__(self, weights: Weights | None = None):
         self.w = weights or Weights()
         self.crop_df = None
+        self.crop_arrays = None   # feature -> float64 array, one entry per crop_df row
+        self.crop_codes = None    # crop name -> crop_df row
 
     # ---------- Fit ----------
     def fit(self, crop_df: pd.DataFrame):
-        required_cols = ["crop"] + NDVI_CROP_FEATURES + RAINFALL_CROP_FEATURES + SOIL_MOIST_CROP_FEATURES + TEMP_CROP_FEATURES
+        required_cols = ["crop"] + CROP_FEATURES
         miss = [c for c in required_cols if c not in crop_df.columns]
         if miss:
             raise ValueError(f"Crop CSV missing columns: {miss}")
         self.crop_df = crop_df.reset_index(drop=True).copy()
+        # Compile the requirement columns once so queries never touch pandas rows
+        self.crop_arrays = {c: self.crop_df[c].to_numpy(dtype=np.float64) for c in CROP_FEATURES}
+        self.crop_codes = {name: i for i, name in enumerate(self.crop_df["crop"])}
         return self
 
     # ---------- Distance ----------
@@ -194,8 +359,329 @@ class CropEnvMatcherForKebele:
 
         return float(dist)
 
+    # ---------- Vectorized distance ----------
+    # Same formulas as _distance_one, term for term and in the same order, so the
+    # results are bit-identical. C and A map feature name -> array and only need to
+    # broadcast against each other: aligned 1-D arrays score (crop, instance) pairs,
+    # C[:, None] against A[None, :] gives a crops x instances matrix.
+    #
+    # _c_* are the unweighted components (COMPONENTS); _p_* apply the Weights the
+    # way _distance_one does, i.e. always as (component) * weight.
+    def _c_ndvi(self, C, A):
+        return (
+            np.abs(A["ndvi_peak"] - C["ndvi_peak"]) / np.fmax(0.1, C["ndvi_peak"]) +
+            0.3 * np.abs(A["ndvi_scale"] - C["ndvi_scale"]) / np.fmax(0.1, C["ndvi_scale"]) +
+            np.abs(A["ndvi_seasonal_avg"] - C["ndvi_seasonal_avg"]) / np.fmax(0.1, C["ndvi_seasonal_avg"]) +
+            0.01 * np.abs(A["ndvi_start_of_season"] - C["ndvi_start_of_season"]) +
+            0.01 * np.abs(A["ndvi_end_of_season"] - C["ndvi_end_of_season"]) +
+            clamp_pos_v(C["ndvi_integral"] - A["ndvi_integral"]) / np.fmax(1.0, C["ndvi_integral"]) +
+            0.5 * clamp_pos_v(C["ndvi_threshold"] - A["ndvi_threshold"]) / np.fmax(0.05, C["ndvi_threshold"]) +
+            0.5 * clamp_pos_v(np.abs(A["ndvi_anomaly_avg"]) - np.abs(C["ndvi_anomaly_avg"])) / np.fmax(0.05, np.abs(C["ndvi_anomaly_avg"]))
+        )
+
+    def _c_rain_total(self, C, A):
+        return range_penalty_v(
+            A["seasonal_rainfall_total"],
+            C["seasonal_rainfall_total_min"], C["seasonal_rainfall_total_opt"], C["seasonal_rainfall_total_max"],
+            w_in=1.0, w_under=2.2, w_over=1.6
+        )
+
+    def _c_sow(self, C, A):
+        sow_days = window_distance_v(A["onset_date"], C["onset_date"], C["cessation_date"])
+        window_len = np.mod(C["cessation_date"] - C["onset_date"], 365)
+        window_len = np.where(window_len == 0, 30, window_len)
+        return sow_days / np.fmax(1.0, window_len)
+
+    def _c_rainy_min(self, C, A):
+        return clamp_pos_v(C["rainy_days_count"] - A["rainy_days_count"]) / np.fmax(1.0, C["rainy_days_count"])
+
+    def _c_dry(self, C, A):
+        p_dry_consec = clamp_pos_v(A["dry_spell_days"] - C["dry_spell_days"]) / np.fmax(1.0, C["dry_spell_days"])
+        p_dry_def = 0.2 * np.abs(A["dry_spell_threshold"] - C["dry_spell_threshold"]) / np.fmax(1.0, C["dry_spell_threshold"])
+        return p_dry_consec + p_dry_def
+
+    def _c_onset(self, C, A):
+        p_onset_delay = clamp_pos_v(A["onset_delay_days"] - C["onset_delay_days"]) / np.fmax(1.0, C["onset_delay_days"])
+        p_onset_mm = 0.4 * np.abs(A["onset_threshold"] - C["onset_threshold"]) / np.fmax(5.0, C["onset_threshold"])
+        p_rainydef = 0.3 * np.abs(A["rainy_day_threshold"] - C["rainy_day_threshold"]) / np.fmax(1.0, C["rainy_day_threshold"])
+        return p_onset_delay + p_onset_mm + p_rainydef
+
+    def _c_var(self, C, A):
+        var_excess = clamp_pos_v(A["rainfall_std_dev"] - C["rainfall_std_dev"]) / np.fmax(1.0, C["rainfall_std_dev"])
+        skew_mismatch = np.abs(A["rainfall_skewness"] - C["rainfall_skewness"]) / np.fmax(0.2, np.abs(C["rainfall_skewness"]))
+        return var_excess + 0.3 * skew_mismatch
+
+    def _c_soil(self, C, A):
+        p_sm_min = clamp_pos_v(C["mean_soil_moisture"] - A["mean_soil_moisture"]) / np.fmax(1.0, C["mean_soil_moisture"])
+        p_sm_drydays = clamp_pos_v(A["dry_soil_days"] - C["dry_soil_days"]) / np.fmax(1.0, C["dry_soil_days"])
+        p_sm_thresh = clamp_pos_v(C["dry_threshold"] - A["dry_threshold"]) / np.fmax(1.0, C["dry_threshold"])
+        p_sm_var = np.abs(A["soil_moisture_std"] - C["soil_moisture_std"]) / np.fmax(1.0, C["soil_moisture_std"])
+        return p_sm_min + 0.7*p_sm_drydays + 0.5*p_sm_thresh + 0.3*p_sm_var
+
+    def _c_t_mean(self, C, A):
+        opt_center = 0.5*(C["mean_temp_season_min"] + C["mean_temp_season_max"])
+        return range_penalty_v(
+            A["mean_temp_season"], C["mean_temp_season_min"], opt_center, C["mean_temp_season_max"],
+            w_in=1.0, w_under=2.0, w_over=2.0
+        )
+
+    def _c_text(self, C, A):
+        p_t_max = clamp_pos_v(A["max_temp_avg"] - C["max_temp_avg"]) / np.fmax(1.0, C["max_temp_avg"])
+        p_t_min = clamp_pos_v(C["min_temp_avg"] - A["min_temp_avg"]) / np.fmax(1.0, np.abs(C["min_temp_avg"]))
+        return p_t_max + p_t_min
+
+    def _c_gdd(self, C, A):
+        p_gdd = np.abs(A["gdd_total"] - C["gdd_total"]) / np.fmax(50.0, C["gdd_total"])
+        return p_gdd + 0.2 * np.abs(A["gdd_base_temp"] - C["gdd_base_temp"]) / np.fmax(1.0, C["gdd_base_temp"])
+
+    def _c_heat(self, C, A):
+        p_hw_days = clamp_pos_v(A["heatwave_days"] - C["heatwave_days"]) / np.fmax(1.0, C["heatwave_days"])
+        p_hw_thr = 0.2 * np.abs(A["heatwave_threshold"] - C["heatwave_threshold"]) / np.fmax(1.0, C["heatwave_threshold"])
+        return p_hw_days + p_hw_thr
+
+    def _p_ndvi(self, C, A): return self._c_ndvi(C, A) * self.w.ndvi
+    def _p_soil(self, C, A): return self._c_soil(C, A) * self.w.soil_moisture
+    def _p_t_mean(self, C, A): return self._c_t_mean(C, A) * self.w.temperature_mean
+    def _p_text(self, C, A): return self._c_text(C, A) * self.w.temperature_extremes
+    def _p_gdd(self, C, A): return self._c_gdd(C, A) * self.w.gdd
+    def _p_heat(self, C, A): return self._c_heat(C, A) * self.w.heatwaves
+
+    def _p_rain(self, C, A, p_rain_total=None):
+        w = self.w
+        if p_rain_total is None:
+            p_rain_total = self._c_rain_total(C, A)
+        p_sow = self._c_sow(C, A) * w.sow_window
+        p_rainy_min = self._c_rainy_min(C, A) * w.rainy_days_min
+        p_dry = self._c_dry(C, A) * w.dry_spells
+        p_onset = self._c_onset(C, A) * w.onset_dynamics
+        p_var = self._c_var(C, A) * w.variability
+        return (p_rain_total + p_sow + p_rainy_min + p_dry + p_onset + p_var) * w.rainfall
+
+    def _group_penalties(self, C, A) -> dict:
+        """Weighted penalty of every group in PENALTY_GROUPS, as arrays."""
+        return {g: getattr(self, "_" + g)(C, A) for g in PENALTY_GROUPS}
+
+    def _combine(self, P: dict, A) -> np.ndarray:
+        """Sum the group penalties into the final distance (plus the quality nudge)."""
+        dist = P["p_ndvi"] + P["p_rain"] + P["p_soil"] + P["p_t_mean"] + P["p_text"] + P["p_gdd"] + P["p_heat"]
+        if self.w.area_quality_alpha > 0:
+            dist = dist / (1.0 + self.w.area_quality_alpha * _quality(A))
+        return dist
+
+    # ---------- Branch and bound ----------
+    # Every group penalty is >= 0, so any partial sum is a lower bound of the final
+    # distance (divided by the quality nudge, which can only shrink it). Pruned
+    # evaluation computes the cheap, selective groups first and drops a pair as soon
+    # as its bound passes the limit; survivors get the exact same distance as above.
+    PRUNE_SLACK = 1e-9  # relative; the stage-1 rain bound is regrouped, so allow rounding
+
+    def _stage1_bound(self, C, A):
+        """Rainfall-total and mean-temperature range penalties: (bound, p_rain_total, p_t_mean)."""
+        p_rain_total = self._c_rain_total(C, A)
+        p_t_mean = self._p_t_mean(C, A)
+        return p_rain_total * self.w.rainfall + p_t_mean, p_rain_total, p_t_mean
+
+    def _pruned_distances(self, crop_idx: np.ndarray, A, limit: np.ndarray):
+        """
+        Distances of the pairs (crop_idx[i], A[i]) whose distance can be <= limit[i];
+        pairs proven to exceed their limit are left as NaN. Returns (dist, group penalties).
+        """
+        n = len(crop_idx)
+        cap = limit * (1.0 + self.PRUNE_SLACK)
+        if self.w.area_quality_alpha > 0:
+            cap = cap * (1.0 + self.w.area_quality_alpha * _quality(A))
+        P = {g: np.full(n, np.nan) for g in PENALTY_GROUPS}
+
+        # Stage 1: rainfall total + mean temperature
+        idx = np.arange(n)
+        bound, p_rain_total, P["p_t_mean"] = self._stage1_bound(_Take(self.crop_arrays, crop_idx), A)
+        keep = bound <= cap
+        idx, bound, p_rain_total = idx[keep], bound[keep], p_rain_total[keep]
+
+        # Stage 2: temperature extremes, GDD, heatwaves
+        c, a = _Take(self.crop_arrays, crop_idx[idx]), _Take(A, idx)
+        for g in ("p_text", "p_gdd", "p_heat"):
+            P[g][idx] = getattr(self, "_" + g)(c, a)
+            bound = bound + P[g][idx]
+        keep = bound <= cap[idx]
+        idx, p_rain_total = idx[keep], p_rain_total[keep]
+
+        # Stage 3: everything else, then the exact distance
+        c, a = _Take(self.crop_arrays, crop_idx[idx]), _Take(A, idx)
+        P["p_rain"][idx] = self._p_rain(c, a, p_rain_total)
+        P["p_soil"][idx] = self._p_soil(c, a)
+        P["p_ndvi"][idx] = self._p_ndvi(c, a)
+        dist = np.full(n, np.nan)
+        dist[idx] = self._combine({g: P[g][idx] for g in PENALTY_GROUPS}, a)
+        return dist, P
+
+    def _top_k_distances(self, crop_idx, A, group, kebele_idx, max_distance, top_k):
+        """
+        Pruned distances when only the top_k crops of each kebele are wanted. Groups
+        (kebele, crop) are evaluated best-bound first, top_k per kebele per round; the
+        k-th best distance found so far is the kebele's running threshold, and groups
+        whose bound exceeds it are never evaluated. Returns (dist, group penalties).
+        """
+        n = len(crop_idx)
+        dist = np.full(n, np.nan)
+        P = {g: np.full(n, np.nan) for g in PENALTY_GROUPS}
+        bound = self._stage1_bound(_Take(self.crop_arrays, crop_idx), A)[0]
+        if self.w.area_quality_alpha > 0:
+            bound = bound / (1.0 + self.w.area_quality_alpha * _quality(A))
+        g_ids, g_pos = _grouped_argmin(group, bound)
+        g_lb, g_keb = bound[g_pos], kebele_idx[g_pos]
+        g_best = np.full(len(g_ids), np.inf)
+        threshold = np.full(kebele_idx.max() + 1, float(max_distance))
+        pending = np.ones(len(g_ids), dtype=bool)
+        order = np.lexsort((g_lb, g_keb))  # per kebele, most promising first
+        pair_group = np.searchsorted(g_ids, group)
+
+        while True:
+            pending &= g_lb <= threshold[g_keb] * (1.0 + self.PRUNE_SLACK)
+            cand = order[pending[order]]
+            if not len(cand):
+                break
+            keb = g_keb[cand]
+            nth = np.arange(len(cand)) - np.searchsorted(keb, keb, side="left")
+            chosen = cand[nth < top_k]
+            pending[chosen] = False
+
+            in_round = np.zeros(len(g_ids), dtype=bool)
+            in_round[chosen] = True
+            pairs = np.flatnonzero(in_round[pair_group])
+            dist[pairs], P_round = self._pruned_distances(crop_idx[pairs], _Take(A, pairs),
+                                                          threshold[kebele_idx[pairs]])
+            for g in PENALTY_GROUPS:
+                P[g][pairs] = P_round[g]
+            np.minimum.at(g_best, pair_group[pairs], np.nan_to_num(dist[pairs], nan=np.inf))
+
+            # threshold = min(max_distance, k-th best group distance of the kebele)
+            o = np.lexsort((g_best, g_keb))
+            keb = g_keb[o]
+            nth = np.arange(len(o)) - np.searchsorted(keb, keb, side="left")
+            kth = o[nth == top_k - 1]
+            threshold[g_keb[kth]] = np.fmin(threshold[g_keb[kth]], g_best[kth])
+        return dist, P
+
+    def _as_instances(self, area_instances) -> AreaInstances:
+        if isinstance(area_instances, AreaInstances):
+            return area_instances
+        return AreaInstances.from_dicts(area_instances)
+
+    def _scorable(self, area: AreaInstances, by_kebele: bool = True, crops=None):
+        """
+        Instances whose crop we have requirements for (and is in crops, if given), with
+        their crop_df row and kebele codes: (area subset, crop_idx, kebele_idx, kebele_names), or None.
+        """
+        crops = None if crops is None else set(crops)
+        vocab = np.array([self.crop_codes.get(name, -1) if crops is None or name in crops else -1
+                          for name in area.crop_names], dtype=np.intp)
+        crop_all = vocab[area.crop] if len(area) else np.empty(0, dtype=np.intp)
+        keep = np.flatnonzero(crop_all >= 0)
+        if not len(keep):
+            return None
+        if len(keep) < len(area):
+            area = area.take(keep)
+        if by_kebele:
+            return area, crop_all[keep], area.kebele, area.kebele_names
+        return area, crop_all[keep], np.zeros(len(keep), dtype=np.intp), [0]
+
+    def distance_matrix(self, area_instances: "list[dict] | AreaInstances") -> np.ndarray:
+        """
+        Distance of EVERY crop in crop_df to EVERY area instance (crops x instances),
+        regardless of the instance's own "crop" label.
+        """
+        assert self.crop_df is not None, "Call fit(crop_df) first."
+        A = {k: v[None, :] for k, v in self._as_instances(area_instances).columns.items()}
+        C = {k: v[:, None] for k, v in self.crop_arrays.items()}
+        return self._combine(self._group_penalties(C, A), A)
+
+    # ---------- Weight sweeps ----------
+    def sweep(self, area_instances: "list[dict] | AreaInstances", weights: list[Weights],
+              relevance: dict | None = None, k: int = 5) -> pd.DataFrame:
+        """
+        Evaluate many Weights configurations in one pass, for tuning.
+
+        The unweighted components are computed once for every (crop, instance) pair
+        (len(COMPONENTS) x pairs) and every configuration's distances come out of a
+        single matrix product with weight_coefficients(weights); the per-(kebele, crop)
+        minimum is a grouped reduction over all configurations at once. Distances
+        agree with query_kebele up to float rounding; max_distance is not applied.
+
+        Instances may carry a kebele (dict key or AreaInstances.kebele) to sweep over several kebeles. Returns one
+        row per configuration with its weights and ranking metrics, averaged over kebeles:
+          overlap@k   share of the top-k crops also in the top k under self.w
+          spearman    rank correlation with the ranking under self.w
+          ndcg@k      only if relevance={(kebele, crop): gain} is given
+                      (kebele is None when instances carry no "kebele")
+        """
+        assert self.crop_df is not None, "Call fit(crop_df) first."
+        scorable = self._scorable(self._as_instances(area_instances))
+        if scorable is None:
+            return pd.DataFrame([])
+        A, crop_idx, kebele_idx, kebele_names = scorable
+        # kebele codes may have gaps once instances are filtered; make them dense
+        present, kebele_idx = np.unique(kebele_idx, return_inverse=True)
+        kebele_names = [kebele_names[i] for i in present]
+        group = kebele_idx * len(self.crop_df) + crop_idx
+
+        # Components of every pair, then distances for every configuration (reference first)
+        C = {k_: v[crop_idx] for k_, v in self.crop_arrays.items()}
+        X = np.stack([getattr(self, "_c_" + c)(C, A) for c in COMPONENTS])
+        configs = [self.w] + list(weights)
+        D = weight_coefficients(configs) @ X
+        alpha = np.array([w.area_quality_alpha for w in configs])[:, None]
+        D = D / (1.0 + alpha * _quality(A)[None, :])
+
+        # Per-(kebele, crop) minimum for all configurations at once
+        order = np.argsort(group, kind="stable")
+        g_sorted = group[order]
+        starts = np.flatnonzero(np.r_[True, g_sorted[1:] != g_sorted[:-1]])
+        G = np.minimum.reduceat(D[:, order], starts, axis=1)   # configs x groups
+        g_keb = g_sorted[starts] // len(self.crop_df)
+        g_crop = g_sorted[starts] % len(self.crop_df)
+        n_keb = np.bincount(g_keb)
+        keb_start = np.searchsorted(g_keb, np.arange(len(n_keb)))  # groups are sorted by kebele
+
+        def ranks(values):
+            o = np.lexsort((values, g_keb))
+            r = np.empty(len(o), dtype=np.intp)
+            r[o] = np.arange(len(o)) - keb_start[g_keb[o]]
+            return r
+
+        gains = None
+        if relevance is not None:
+            gains = np.array([float(relevance.get((kebele_names[kb], self.crop_df.at[cr, "crop"]), 0.0))
+                              for kb, cr in zip(g_keb, g_crop)])
+            ideal = np.zeros(len(n_keb))
+            for kb in range(len(n_keb)):
+                top = np.sort(gains[g_keb == kb])[::-1][:k]
+                ideal[kb] = np.sum(top / np.log2(np.arange(len(top)) + 2))
+
+        ref_rank = ranks(G[0])
+        ref_top = ref_rank < k
+        multi = n_keb > 1
+        rows = []
+        for w, values in zip(weights, G[1:]):
+            r = ranks(values)
+            top = r < k
+            overlap = np.bincount(g_keb, weights=top & ref_top, minlength=len(n_keb)) / np.minimum(k, n_keb)
+            d2 = np.bincount(g_keb, weights=(r - ref_rank) ** 2.0, minlength=len(n_keb))
+            spearman = 1.0 - 6.0 * d2[multi] / (n_keb[multi] * (n_keb[multi] ** 2 - 1.0))
+            row = asdict(w)
+            row["overlap@k"] = float(overlap.mean())
+            row["spearman"] = float(spearman.mean()) if multi.any() else 1.0
+            if gains is not None:
+                dcg = np.bincount(g_keb, weights=np.where(top, gains / np.log2(r + 2.0), 0.0), minlength=len(n_keb))
+                has_gain = ideal > 0
+                row["ndcg@k"] = float((dcg[has_gain] / ideal[has_gain]).mean()) if has_gain.any() else float("nan")
+            rows.append(row)
+        return pd.DataFrame(rows)
+
     # ---------- Query ----------
-    def query_kebele(self, area_instances: list[dict], max_distance: float = 25.0, return_all=True) -> pd.DataFrame:
+    def query_kebele(self, area_instances: "list[dict] | AreaInstances", max_distance: float = 25.0, return_all=True,
+                     prune: bool = False, top_k: int | None = None, explain: bool = False,
+                     stats: dict | None = None) -> pd.DataFrame:
         """
         area_instances: list of dicts; EACH dict must include:
             "crop" plus all area-side keys referenced in _distance_one:
@@ -205,48 +691,121 @@ class CropEnvMatcherForKebele:
             mean_soil_moisture, dry_soil_days, dry_threshold, soil_moisture_std,
             mean_temp_season, max_temp_avg, min_temp_avg, gdd_total, gdd_base_temp, heatwave_days, heatwave_threshold
         For each crop in crop_df, we find matching area dicts (by "crop") and take the MIN distance.
-        """
-        assert self.crop_df is not None, "Call fit(crop_df) first."
+        An AreaInstances (columnar, e.g. straight from a values_list query) can be passed
+        instead of the dicts; its kebele codes are ignored here.
 
-        # Print crop names for debugging
-        print("Crop names in crop_df:", list(self.crop_df["crop"]))
-        print("Crop names in area_instances:", [d.get("crop") for d in area_instances])
+        prune=True skips pairs as soon as their partial distance exceeds max_distance;
+        top_k=N keeps only the N best crops and prunes against a running threshold
+        (implies pruning). Results are the same as the unpruned query (cut to top_k).
 
-        # Index area instances by Crop for quick lookup
-        by_crop = {}
-        for d in area_instances:
-            c = d.get("crop")
-            if c is None: continue
-            by_crop.setdefault(c, []).append(d)
+        explain=True adds the weighted penalty of every group (PENALTY_GROUPS, which sum
+        to the distance before the quality nudge) for the best instance of each crop.
+        If a stats dict is passed it receives the pair counts (pairs, evaluated, pruned)
+        and timings_ms for the prepare / score / rank phases.
+        """
+        assert self.crop_df is not None, "Call fit(crop_df) first."
+        area = self._as_instances(area_instances)
+        return self._rank(area, False, max_distance, prune, top_k, explain, stats).get(0, pd.DataFrame([]))
 
-        rows = []
-        for i, crop in self.crop_df.iterrows():
-            crop_name = crop["crop"]
-            if crop_name not in by_crop:
-                continue  # no area instance for this crop in this kebele
-            # compute distance for all instances of this crop; keep min
-            dists = [self._distance_one(crop, a) for a in by_crop[crop_name]]
-            best_idx = int(np.argmin(dists))
-            best_dist = float(dists[best_idx])
-            best_area = by_crop[crop_name][best_idx]
-            print(f"Crop: {crop_name}, Best Distance: {best_dist}")
-            # Only append if best_dist <= max_distance
-            if best_dist <= max_distance:
-                rows.append({
-                    "crop": crop_name,
-                    "distance": best_dist,
-                    "best_area_index": best_idx,
-                    "seasonal_rainfall_total": best_area.get("seasonal_rainfall_total"),
-                    "mean_temp_season": best_area.get("mean_temp_season"),
-                    "data_quality_flag": best_area.get("data_quality_flag"),
-                    "ndvi_peak": best_area.get("ndvi_peak"),  # <-- Add this line
-                })
-
-        out = pd.DataFrame(rows)
-        if not out.empty and "distance" in out.columns:
-            out = out.sort_values("distance").reset_index(drop=True)
-        print("Matches found:", out.to_dict(orient="records"))
-        return out
+    def query_kebeles(self, area_instances: "list[dict] | AreaInstances", max_distance: float = 25.0,
+                      prune: bool = False, top_k: int | None = None, explain: bool = False,
+                      stats: dict | None = None, crops=None) -> dict:
+        """
+        Batch version of query_kebele for instances from several kebeles: each dict
+        also carries a "kebele" key (or pass an AreaInstances). All instances are scored in a single vectorized
+        pass; returns {kebele: DataFrame ranked like query_kebele's output}.
+        Kebeles without any scorable instance are absent from the result.
+        prune/top_k/explain/stats as in query_kebele, top_k applying per kebele.
+        crops=[name, ...] scores only those crops' instances, e.g. to recompute one
+        crop column after its requirements changed.
+        """
+        assert self.crop_df is not None, "Call fit(crop_df) first."
+        area = self._as_instances(area_instances)
+        return self._rank(area, True, max_distance, prune, top_k, explain, stats, crops)
+
+    def _rank(self, area: AreaInstances, by_kebele: bool, max_distance: float,
+              prune: bool = False, top_k: int | None = None, explain: bool = False,
+              stats: dict | None = None, crops=None) -> dict:
+        """Best instance per (kebele, crop), filtered by max_distance and sorted per kebele."""
+        t_start = time.perf_counter()
+        # Keep instances whose crop we have requirements for; code = crop_df row
+        scorable = self._scorable(area, by_kebele, crops)
+        if scorable is None:
+            if stats is not None:
+                stats.update(pairs=0, evaluated=0, pruned=0)
+            return {}
+        A, crop_idx, kebele_idx, kebele_names = scorable
+        group = kebele_idx * len(self.crop_df) + crop_idx
+
+        # Score every (crop, instance) pair in one pass, then keep the min per group.
+        # Pruned pairs come back as NaN, which the grouped argmin ranks last.
+        t_prepared = time.perf_counter()
+        if top_k:
+            dist, P = self._top_k_distances(crop_idx, A, group, kebele_idx, max_distance, top_k)
+        elif prune:
+            dist, P = self._pruned_distances(crop_idx, A, np.full(len(crop_idx), float(max_distance)))
+        else:
+            C = {k: v[crop_idx] for k, v in self.crop_arrays.items()}
+            P = self._group_penalties(C, A)
+            dist = self._combine(P, A)
+        _, best_pos = _grouped_argmin(group, dist)
+        t_scored = time.perf_counter()
+
+        # best_area_index is the position among the group's instances (input order)
+        order = np.argsort(group, kind="stable")
+        starts = np.searchsorted(group[order], group[order], side="left")
+        within = np.empty_like(order)
+        within[order] = np.arange(len(order)) - starts
+
+        # Reduced-precision kernel: rescore each group's winner from the float64 source
+        exact = A.exact_columns()
+        best_dist = dist
+        if A.exact is not None and len(best_pos):
+            best_dist = dist.copy()
+            kept = best_pos[~np.isnan(dist[best_pos])]
+            a = _Take(exact, kept)
+            P_best = self._group_penalties(_Take(self.crop_arrays, crop_idx[kept]), a)
+            best_dist[kept] = self._combine(P_best, a)
+            for g in PENALTY_GROUPS:
+                P[g][kept] = P_best[g]
+
+        # Rows straight from the columns: within max_distance, by kebele then distance
+        best_pos = best_pos[best_dist[best_pos] <= max_distance]
+        best_pos = best_pos[np.lexsort((best_dist[best_pos], kebele_idx[best_pos]))]
+        quality = exact["data_quality_flag"][best_pos]
+        if np.isnan(quality).any():
+            quality = np.where(np.isnan(quality), None, quality)
+        table = {
+            "crop": self.crop_df["crop"].to_numpy()[crop_idx[best_pos]],
+            "distance": best_dist[best_pos],
+            "best_area_index": within[best_pos],
+            "seasonal_rainfall_total": exact["seasonal_rainfall_total"][best_pos],
+            "mean_temp_season": exact["mean_temp_season"][best_pos],
+            "data_quality_flag": quality,
+            "ndvi_peak": exact["ndvi_peak"][best_pos],
+        }
+        if explain:
+            table.update((g, P[g][best_pos]) for g in PENALTY_GROUPS)
+
+        results = {}
+        keb = kebele_idx[best_pos]
+        bounds = np.flatnonzero(np.r_[True, keb[1:] != keb[:-1], True]) if len(keb) else []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            out = pd.DataFrame({k: v[lo:hi] for k, v in table.items()})
+            if top_k:
+                out = out.head(top_k)
+            results[kebele_names[keb[lo]]] = out
+
+        if stats is not None:
+            evaluated = int(np.count_nonzero(~np.isnan(dist))) if (prune or top_k) else len(dist)
+            stats.update(pairs=len(dist), evaluated=evaluated, pruned=len(dist) - evaluated)
+            t_end = time.perf_counter()
+            stats["timings_ms"] = {
+                "prepare": (t_prepared - t_start) * 1e3,
+                "score": (t_scored - t_prepared) * 1e3,
+                "rank": (t_end - t_scored) * 1e3,
+            }
+        return results
 
 # -----------------------------
 # Minimal example
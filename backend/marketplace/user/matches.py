@@ -0,0 +1,40 @@
+"""
+Farmer matching for exporters' crop requirements (post_crop_requirement and its
+background task, jobs.tasks.match_requirement).
+"""
+from .models import CropRequirement, FarmerExporterMatch, LandDetail
+
+BATCH_SIZE = 1000
+
+
+def match_farmers(requirement: CropRequirement) -> list[dict]:
+    """
+    Match every farmer with land in the requirement's region, once, against their
+    first plot there, and create the FarmerExporterMatch rows: one query for the
+    plots and their farmers, one for farmers already matched (so a retried job
+    adds nothing twice), and batched INSERTs. Returns the matched farmers.
+    """
+    lands = (LandDetail.objects.filter(region=requirement.region)
+             .order_by('id')
+             .values_list('id', 'user_id', 'user__username'))
+    matched = set(requirement.matches.values_list('farmer_id', flat=True))
+    matched_farmers, objs = [], []
+    for land_id, farmer_id, username in lands:
+        if farmer_id in matched:
+            continue
+        matched.add(farmer_id)
+        matched_farmers.append({
+            "farmer_id": farmer_id,
+            "farmer_username": username,
+            "crop_name": requirement.crop_name
+        })
+        objs.append(FarmerExporterMatch(
+            farmer_id=farmer_id,
+            exporter_id=requirement.exporter_id,
+            crop_requirement=requirement,
+            land_detail_id=land_id,
+            crop_name=requirement.crop_name,
+            status='pending'
+        ))
+    FarmerExporterMatch.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    return matched_farmers
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_farmerexportermatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KebeleRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kebele', models.CharField(max_length=100)),
+                ('crop', models.CharField(max_length=100)),
+                ('distance', models.FloatField()),
+                ('rank', models.PositiveIntegerField(help_text='1 = best crop for the kebele')),
+                ('best_area_index', models.IntegerField()),
+                ('seasonal_rainfall_total', models.FloatField(null=True)),
+                ('mean_temp_season', models.FloatField(null=True)),
+                ('data_quality_flag', models.FloatField(null=True)),
+                ('ndvi_peak', models.FloatField(null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kebele', 'rank'], name='kebele_rec_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kebele', 'crop'), name='unique_kebele_recommendation')],
+            },
+        ),
+    ]
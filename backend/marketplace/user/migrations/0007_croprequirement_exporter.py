@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_exporter(apps, schema_editor):
+    """Existing requirements get the exporter of their matches (requirements without matches stay unowned)."""
+    CropRequirement = apps.get_model('user', 'CropRequirement')
+    FarmerExporterMatch = apps.get_model('user', 'FarmerExporterMatch')
+    owners = dict(FarmerExporterMatch.objects.order_by('crop_requirement_id', 'id')
+                  .values_list('crop_requirement_id', 'exporter_id'))
+    for requirement_id, exporter_id in owners.items():
+        CropRequirement.objects.filter(pk=requirement_id, exporter__isnull=True).update(exporter_id=exporter_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_kebelerecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='croprequirement',
+            name='exporter',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='crop_requirements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_exporter, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='croprequirement',
+            index=models.Index(fields=['exporter', '-created_at', '-id'], name='requirement_exporter_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='farmerexportermatch',
+            index=models.Index(fields=['exporter', '-matched_on', '-id'], name='match_exporter_page_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+
+def merge_duplicate_kebeles(apps, schema_editor):
+    """Keep the first Kebele row per kebele_id and move the land details of the others onto it."""
+    Kebele = apps.get_model('user', 'Kebele')
+    LandDetail = apps.get_model('user', 'LandDetail')
+    keep = {}
+    for pk, kebele_id in Kebele.objects.order_by('id').values_list('id', 'kebele_id'):
+        if kebele_id not in keep:
+            keep[kebele_id] = pk
+            continue
+        LandDetail.objects.filter(kebele_id_id=pk).update(kebele_id_id=keep[kebele_id])
+        Kebele.objects.filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_croprequirement_exporter'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_kebeles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='kebele',
+            name='kebele_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='landdetail',
+            name='region',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+    ]
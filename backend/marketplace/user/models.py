@@ -56,7 +56,7 @@ class ExporterProfile(models.Model):
     payment_terms = models.TextField(blank=True, null=True)
 
 class Kebele(models.Model):
-    kebele_id = models.CharField(max_length=100)
+    kebele_id = models.CharField(max_length=100, unique=True)
 
 class LandDetail(models.Model):
     SOIL_TYPE_CHOICES = [
@@ -68,7 +68,7 @@ class LandDetail(models.Model):
         ('fluvisol', 'Fluvisol (Alluvial Soil)'),
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='land_details')
-    region = models.CharField(max_length=50)
+    region = models.CharField(max_length=50, db_index=True)
     location = models.CharField(max_length=100)
     plot_size = models.FloatField(help_text="Size in hectares")
     soil_type = models.CharField(max_length=20, choices=SOIL_TYPE_CHOICES)
@@ -96,6 +96,7 @@ class CropRequirement(models.Model):
         ('avocado', 'Avocado'),
         ('banana', 'Banana'),
     ]
+    exporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='crop_requirements', null=True, blank=True)
     crop_name = models.CharField(max_length=30, choices=CROP_CHOICES)
     quantity = models.FloatField(help_text="Quantity required in tons")
     price_per_kg = models.FloatField(help_text="Price per kg in ETB")
@@ -105,6 +106,12 @@ class CropRequirement(models.Model):
     additional_notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # exporter_home pages newest first on (created_at, id)
+            models.Index(fields=['exporter', '-created_at', '-id'], name='requirement_exporter_page_idx'),
+        ]
+
     def __str__(self):
         return f"{self.crop_name} ({self.quantity} tons) for {self.region}"
 
@@ -117,5 +124,39 @@ class FarmerExporterMatch(models.Model):
     matched_on = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='pending')  # e.g. pending, accepted, rejected
 
+    class Meta:
+        indexes = [
+            # exporter_home pages newest first on (matched_on, id)
+            models.Index(fields=['exporter', '-matched_on', '-id'], name='match_exporter_page_idx'),
+        ]
+
+    def __str__(self):
+        return f"Match: {self.crop_name} | Farmer: {self.farmer.username} | Exporter: {self.exporter.username}"
+
+
+class KebeleRecommendation(models.Model):
+    """
+    Precomputed matcher output: best distance of every crop in every kebele that has
+    KebeleCrop data. Rebuilt by recommender.refresh_recommendations after data loads.
+    """
+    kebele = models.CharField(max_length=100)
+    crop = models.CharField(max_length=100)
+    distance = models.FloatField()
+    rank = models.PositiveIntegerField(help_text="1 = best crop for the kebele")
+    best_area_index = models.IntegerField()
+    seasonal_rainfall_total = models.FloatField(null=True)
+    mean_temp_season = models.FloatField(null=True)
+    data_quality_flag = models.FloatField(null=True)
+    ndvi_peak = models.FloatField(null=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kebele', 'crop'], name='unique_kebele_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['kebele', 'rank'], name='kebele_rec_rank_idx'),
+        ]
+
     def __str__(self):
-        return f"Match: {self.crop_name} | Farmer: {self.farmer.username} | Exporter: {self.exporter.username}"
\ No newline at end of file
+        return f"{self.kebele} - {self.crop} (#{self.rank}, {self.distance:.2f})"
@@ -0,0 +1,132 @@
+"""
+Similarity index over kebele climate profiles.
+
+A kebele's profile is the mean of its KebeleCrop rows (the per-kebele aggregate
+scrapers/cluster.py builds), standardized per feature. Kebeles without any
+KebeleCrop rows have no profile; they are placed by geography instead, using the
+coordinates in their LandDetail locations ("..., Ethiopia (9.0079, 38.7678)").
+
+The index is built by `manage.py build_neighbor_index` and saved with joblib under
+settings.MODELS_DIR, next to the clustering artifacts; web workers only load it.
+"""
+import os
+import re
+import threading
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from sklearn.neighbors import BallTree
+from sklearn.preprocessing import StandardScaler
+
+from crop.models import KebeleCrop
+from .matcher import AREA_FEATURES
+from .models import LandDetail
+
+INDEX_FILE = "kebele_neighbors.joblib"
+EARTH_RADIUS_KM = 6371.0
+_LAT_LON = re.compile(r'\(([-+]?\d*\.\d+|\d+),\s*([-+]?\d*\.\d+|\d+)\)')
+
+_lock = threading.Lock()
+_loaded = {"mtime": None, "index": None}
+
+
+def parse_lat_lon(location: str):
+    """(lat, lon) from a location string like "Addis Ababa, Ethiopia (9.0079, 38.7678)", or None."""
+    match = _LAT_LON.search(location or "")
+    return (float(match.group(1)), float(match.group(2))) if match else None
+
+
+class KebeleNeighborIndex:
+    """
+    BallTree over standardized per-kebele feature means (climate neighbours), plus a
+    haversine BallTree over the known kebele coordinates (geographic neighbours).
+    """
+
+    def __init__(self, kebele_ids, scaler, profiles, geo_kebele_ids, coords):
+        self.kebele_ids = np.asarray(kebele_ids, dtype=object)
+        self.position = {kebele: i for i, kebele in enumerate(self.kebele_ids)}
+        self.scaler = scaler
+        self.profiles = profiles
+        self.tree = BallTree(profiles)
+        self.geo_kebele_ids = np.asarray(geo_kebele_ids, dtype=object)
+        self.coords = coords
+        self.geo_tree = BallTree(np.radians(coords), metric="haversine") if len(coords) else None
+
+    @classmethod
+    def build(cls) -> "KebeleNeighborIndex":
+        rows = KebeleCrop.objects.values_list("kebele", *AREA_FEATURES)
+        means = pd.DataFrame.from_records(list(rows), columns=["kebele"] + AREA_FEATURES).groupby("kebele").mean()
+        # Features that are constant across kebeles carry no signal (and scale to NaN)
+        means = means.loc[:, means.std() > 0]
+        scaler = StandardScaler().fit(means.to_numpy())
+        profiles = scaler.transform(means.to_numpy())
+
+        # One coordinate per kebele that has a profile: the mean of its land locations
+        located = {}
+        for kebele, location in LandDetail.objects.filter(kebele_id__kebele_id__in=list(means.index)) \
+                .values_list("kebele_id__kebele_id", "location"):
+            lat_lon = parse_lat_lon(location)
+            if lat_lon is not None:
+                located.setdefault(kebele, []).append(lat_lon)
+        geo_kebele_ids = sorted(located)
+        coords = np.array([np.mean(located[k], axis=0) for k in geo_kebele_ids]).reshape(-1, 2)
+        return cls(list(means.index), scaler, profiles, geo_kebele_ids, coords)
+
+    def __len__(self):
+        return len(self.kebele_ids)
+
+    def similar(self, kebele_id, k: int = 5) -> list[tuple]:
+        """The k indexed kebeles closest in climate to an indexed kebele: [(kebele, distance)], nearest first."""
+        i = self.position.get(kebele_id)
+        if i is None:
+            return []
+        k = min(k + 1, len(self))
+        dist, idx = self.tree.query(self.profiles[i:i + 1], k=k)
+        return [(self.kebele_ids[j], float(d)) for d, j in zip(dist[0], idx[0]) if j != i][:k - 1]
+
+    def near(self, lat: float, lon: float, k: int = 5) -> list[tuple]:
+        """The k indexed kebeles closest to a point: [(kebele, km)], nearest first."""
+        if self.geo_tree is None:
+            return []
+        dist, idx = self.geo_tree.query(np.radians([[lat, lon]]), k=min(k, len(self.geo_kebele_ids)))
+        return [(self.geo_kebele_ids[j], float(d) * EARTH_RADIUS_KM) for d, j in zip(dist[0], idx[0])]
+
+    def neighbors(self, kebele_id, k: int = 5, location: str | None = None) -> list[tuple]:
+        """
+        Climate neighbours when the kebele has a profile, otherwise geographic
+        neighbours of location (e.g. its LandDetail.location); [] when neither works.
+        """
+        if kebele_id in self.position:
+            return self.similar(kebele_id, k)
+        lat_lon = parse_lat_lon(location) if location else None
+        return self.near(*lat_lon, k=k) if lat_lon else []
+
+    # ---------- Persistence ----------
+    @staticmethod
+    def path():
+        return os.path.join(settings.MODELS_DIR, INDEX_FILE)
+
+    def save(self, path=None):
+        path = path or self.path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+        return path
+
+
+def get_index() -> KebeleNeighborIndex | None:
+    """The saved index, loaded once per process and reloaded when the file changes; None if not built."""
+    path = KebeleNeighborIndex.path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _loaded["mtime"] != mtime:
+        with _lock:
+            if _loaded["mtime"] != mtime:
+                _loaded["index"] = joblib.load(path)
+                _loaded["mtime"] = mtime
+    return _loaded["index"]
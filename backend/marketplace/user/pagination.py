@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination, newest first.
+
+Pages are cut on an ordered (field, id) pair instead of OFFSET, so every page is
+an index range scan no matter how deep the client pages, and rows inserted while
+paging do not shift later pages. The cursor is the (field, id) of the last row
+served, base64-encoded so clients treat it as opaque.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(value, pk) -> str:
+    raw = json.dumps([value.isoformat() if hasattr(value, "isoformat") else value, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """(value, pk) from a cursor; ValueError if it was not made by encode_cursor."""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, pk = decoded
+        if not isinstance(decoded, list) or not isinstance(value, (str, int, float)) or isinstance(pk, bool):
+            raise ValueError
+        return value, int(pk)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def page_size(raw) -> int:
+    """Requested page size (default PAGE_SIZE, capped at MAX_PAGE_SIZE); ValueError if not a positive int."""
+    if raw in (None, ""):
+        return PAGE_SIZE
+    size = int(raw)
+    if size < 1:
+        raise ValueError("limit must be positive.")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def keyset_page(queryset, field: str, cursor: str | None, limit: int):
+    """
+    One page of queryset ordered by (field, id) descending, starting after cursor.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(f"-{field}", "-id")
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        try:
+            value = queryset.model._meta.get_field(field).to_python(value)
+        except (ValidationError, TypeError):
+            raise ValueError("Invalid cursor.")
+        queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, field), last.id)
@@ -0,0 +1,354 @@
+"""
+Glue between the crop tables and CropEnvMatcherForKebele.
+
+The crop requirement matrix only changes when Crop rows change, so the fitted
+matcher is built once per worker process and reused until the crop version
+(bumped by the Crop save/delete signals in signals.py and by the loaders) moves
+on. The version is a token file shared by all processes (see versions.py), so a
+Crop change made by any worker, command or job reaches every worker.
+"""
+import threading
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.db import transaction
+
+from crop.models import Crop, KebeleCrop
+from marketplace.metrics import timed_matcher
+from .matcher import AreaInstances, CropEnvMatcherForKebele, AREA_FEATURES, CROP_FEATURES
+from .models import Kebele, KebeleRecommendation, LandDetail
+from .neighbors import get_index
+from .snapshot import RecommendationSnapshot, get_snapshot
+from .versions import bump_version, get_version
+
+CROP_VERSION_KEY = "crop"
+# Moves whenever anything a recommendation response is built from changes
+DATA_VERSION_KEY = "data"
+RESPONSE_CACHE_KEY = "recommender:response:{version}:{kebele_id}"
+RESPONSE_CACHE_SECONDS = 24 * 60 * 60
+
+# Fields of a recommendation record, as returned by the matcher and stored in KebeleRecommendation
+RECOMMENDATION_FIELDS = [
+    "crop", "distance", "best_area_index",
+    "seasonal_rainfall_total", "mean_temp_season", "data_quality_flag", "ndvi_peak",
+]
+REFRESH_BATCH_KEBELES = 500
+
+_lock = threading.Lock()
+_fitted = {"version": None, "matcher": None}
+
+
+def crop_frame() -> pd.DataFrame:
+    """All Crop rows as the DataFrame CropEnvMatcherForKebele.fit expects."""
+    rows = Crop.objects.values_list("name", *CROP_FEATURES)
+    return pd.DataFrame.from_records(list(rows), columns=["crop"] + CROP_FEATURES)
+
+
+def crop_version() -> int:
+    """Current crop data version, the same in every process."""
+    return get_version(CROP_VERSION_KEY)
+
+
+def invalidate_crop_matrix():
+    """Mark the compiled crop matrix stale; every worker refits on its next request."""
+    bump_version(CROP_VERSION_KEY)
+
+
+def data_version() -> int:
+    """
+    Version of the recommendation data (time_ns of the last change), used for
+    response caching and as ETag / Last-Modified of recommendation responses.
+    Shared by all processes (see versions.py), so a load run by a command or the
+    job worker moves it for every web worker.
+    """
+    return get_version(DATA_VERSION_KEY)
+
+
+def invalidate_recommendations():
+    """Crop, KebeleCrop or KebeleRecommendation changed: cached responses are stale."""
+    bump_version(DATA_VERSION_KEY)
+
+
+def cached_response(kebele_id, version, build):
+    """
+    Response data for kebele_id at data version, from the cache or build() (then
+    cached). The cache may be per process: entries are keyed by the shared
+    version, so a worker never serves a body older than the current data.
+    """
+    key = RESPONSE_CACHE_KEY.format(version=version, kebele_id=kebele_id)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, RESPONSE_CACHE_SECONDS)
+    return data
+
+
+def get_matcher() -> CropEnvMatcherForKebele:
+    """Fitted matcher for the current Crop table, built at most once per version."""
+    version = crop_version()
+    if _fitted["version"] != version:
+        with _lock:
+            if _fitted["version"] != version:
+                _fitted["matcher"] = CropEnvMatcherForKebele().fit(crop_frame())
+                _fitted["version"] = version
+    return _fitted["matcher"]
+
+
+def score(area: AreaInstances, matcher: CropEnvMatcherForKebele | None = None, **kwargs) -> dict:
+    """
+    matcher.query_kebeles(area, **kwargs) (default: get_matcher()), timed as matcher
+    work in the request metrics.
+    """
+    matcher = matcher or get_matcher()
+    with timed_matcher():
+        return matcher.query_kebeles(area, **kwargs)
+
+
+def area_instances(kebele_ids=None, crops=None) -> AreaInstances:
+    """
+    KebeleCrop rows of the given kebeles (and crops; None = all) as columnar (float32)
+    matcher input, in one query. Tuples from values_list go straight into the arrays,
+    no per-row dicts.
+    """
+    rows = KebeleCrop.objects.all()
+    if kebele_ids is not None:
+        rows = rows.filter(kebele__in=list(kebele_ids))
+    if crops is not None:
+        rows = rows.filter(crop__in=list(crops))
+    rows = rows.values_list("kebele", "crop", *AREA_FEATURES)
+    # KebeleCrop has no quality flag; every instance counts as full quality
+    return AreaInstances.from_values_list(rows, quality=1.0)
+
+
+def query_kebeles(kebele_ids, max_distance: float = 25.0, explain: bool = False, stats: dict | None = None) -> dict:
+    """
+    Ranked recommendations for several kebeles with one KebeleCrop query and one
+    matcher pass: {kebele_id: [record, ...]}, empty list when nothing matched.
+    explain/stats are passed through to the matcher. Served from the snapshot without
+    touching the database when one is current.
+    """
+    kebele_ids = list(kebele_ids)
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        area, matcher = snapshot.area(kebele_ids), snapshot.matcher()
+    else:
+        area, matcher = area_instances(kebele_ids), None
+    results = score(area, matcher, max_distance=max_distance, explain=explain, stats=stats)
+    return {
+        kebele_id: results[kebele_id].to_dict(orient="records") if kebele_id in results else []
+        for kebele_id in kebele_ids
+    }
+
+
+def suitability_frame(kebele_ids) -> pd.DataFrame:
+    """
+    Full kebele x crop suitability for the given kebeles as a long frame
+    (kebele, crop, rank, distance, best_area_index), no distance cut-off.
+    """
+    results = score(area_instances(kebele_ids), max_distance=float("inf"))
+    frames = [
+        df[["crop", "distance", "best_area_index"]].assign(kebele=kebele, rank=np.arange(1, len(df) + 1))
+        for kebele, df in results.items()
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["kebele", "crop", "rank", "distance", "best_area_index"])
+    return pd.concat(frames, ignore_index=True)[["kebele", "crop", "rank", "distance", "best_area_index"]]
+
+
+SNAPSHOT_SKIPPED = "Data changed while the snapshot was written; it was not published (the database answers)."
+
+
+def write_snapshot() -> RecommendationSnapshot | None:
+    """
+    Write the current KebeleCrop and Crop tables as a new snapshot and switch readers
+    to it. Returns None, leaving readers on the database, when the data changed while
+    it was being read (the next load writes a fresh one).
+    """
+    version = data_version()
+    path = RecommendationSnapshot.write(area_instances(), crop_frame(),
+                                        is_current=lambda: data_version() == version)
+    return None if path is None else RecommendationSnapshot.load(path)
+
+
+# -----------------------------
+# Materialized recommendations
+# -----------------------------
+def stored_recommendations(kebele_ids, max_distance: float = 25.0) -> dict:
+    """
+    Same shape as query_kebeles, read from KebeleRecommendation (one indexed query)
+    instead of running the matcher.
+    """
+    kebele_ids = list(kebele_ids)
+    results = {kebele_id: [] for kebele_id in kebele_ids}
+    rows = (KebeleRecommendation.objects
+            .filter(kebele__in=kebele_ids, distance__lte=max_distance)
+            .order_by("kebele", "rank")
+            .values_list("kebele", *RECOMMENDATION_FIELDS))
+    for kebele, *values in rows:
+        results[kebele].append(dict(zip(RECOMMENDATION_FIELDS, values)))
+    return results
+
+
+def kebeles_without_data(kebele_ids) -> list:
+    """
+    The given kebeles that have neither KebeleRecommendation nor KebeleCrop rows:
+    the ones that may borrow from their neighbours. A kebele with data of its own
+    whose crops are all too far off has no recommendations, not borrowed ones.
+    """
+    kebele_ids = list(kebele_ids)
+    if not kebele_ids:
+        return []
+    has_data = set(KebeleRecommendation.objects.filter(kebele__in=kebele_ids)
+                   .values_list("kebele", flat=True).distinct())
+    has_data.update(KebeleCrop.objects.filter(kebele__in=set(kebele_ids) - has_data)
+                    .values_list("kebele", flat=True).distinct())
+    return [kebele_id for kebele_id in kebele_ids if kebele_id not in has_data]
+
+
+def borrowed_recommendations(kebele_locations: dict, max_distance: float = 25.0, k: int = 5) -> dict:
+    """
+    Recommendations for kebeles without their own, lent by their nearest neighbours
+    in the kebele neighbour index: {kebele_id: location or None}, the location used
+    when the kebele has no climate profile. Per crop, the record of the closest
+    neighbour that has it, tagged with borrowed_from; same shape as
+    stored_recommendations otherwise (one query for all kebeles). Empty lists when
+    no index has been built yet.
+    """
+    index = get_index()
+    neighbours = {
+        kebele_id: [n for n, _ in index.neighbors(kebele_id, k, location)] if index else []
+        for kebele_id, location in kebele_locations.items()
+    }
+    lent = stored_recommendations({n for ns in neighbours.values() for n in ns}, max_distance)
+    results = {}
+    for kebele_id, ns in neighbours.items():
+        best = {}
+        for n in ns:
+            for record in lent[n]:
+                best.setdefault(record["crop"], dict(record, borrowed_from=n))
+        results[kebele_id] = sorted(best.values(), key=lambda record: record["distance"])
+    return results
+
+
+def recommendation_responses(kebele_ids) -> dict:
+    """
+    load_recommendations' data of each kebele: its stored ranking, or one borrowed
+    from its neighbours when it has no data at all (located by one of its land details).
+    """
+    results = stored_recommendations(kebele_ids, max_distance=100.0)
+    missing = kebeles_without_data(kebele_id for kebele_id, records in results.items() if not records)
+    if missing:
+        locations = {}
+        for kebele_id, location in (LandDetail.objects.filter(kebele_id__kebele_id__in=missing)
+                                    .values_list("kebele_id__kebele_id", "location")):
+            locations.setdefault(kebele_id, location)
+        results.update(borrowed_recommendations({k: locations.get(k) for k in missing}, max_distance=100.0))
+    return results
+
+
+def refresh_recommendations(kebele_ids=None) -> int:
+    """
+    Recompute KebeleRecommendation for the given kebeles (default: every kebele with
+    KebeleCrop data) and replace their stored rows. Returns the number of rows written.
+    """
+    full = kebele_ids is None
+    if full:
+        kebele_ids = KebeleCrop.objects.values_list("kebele", flat=True).distinct()
+    kebele_ids = sorted(set(kebele_ids))
+    written = 0
+    with transaction.atomic():
+        if full:
+            # also drops kebeles whose KebeleCrop rows are gone
+            KebeleRecommendation.objects.all().delete()
+        for start in range(0, len(kebele_ids), REFRESH_BATCH_KEBELES):
+            batch = kebele_ids[start:start + REFRESH_BATCH_KEBELES]
+            results = score(area_instances(batch), max_distance=float("inf"))
+            objs = [
+                KebeleRecommendation(kebele=kebele, rank=rank, **{f: record[f] for f in RECOMMENDATION_FIELDS})
+                for kebele, df in results.items()
+                for rank, record in enumerate(df.to_dict(orient="records"), start=1)
+            ]
+            if not full:
+                KebeleRecommendation.objects.filter(kebele__in=batch).delete()
+            KebeleRecommendation.objects.bulk_create(objs, batch_size=1000)
+            written += len(objs)
+        transaction.on_commit(invalidate_recommendations)
+    return written
+
+
+def rescore(kebele_ids=None, crops=None) -> dict:
+    """
+    Recompute the stored recommendations of the given kebeles and/or crops only
+    (None = all) and apply the difference to KebeleRecommendation in place: changed
+    rows are updated, new pairs created, vanished ones deleted, and the affected
+    kebeles re-ranked. Returns the counts of updated/created/deleted/reranked rows.
+    """
+    kebele_ids = None if kebele_ids is None else list(kebele_ids)
+    crops = None if crops is None else list(crops)
+    results = score(area_instances(kebele_ids, crops), max_distance=float("inf"), crops=crops)
+    fresh = {
+        (kebele, record["crop"]): record
+        for kebele, df in results.items()
+        for record in df.to_dict(orient="records")
+    }
+    stored = KebeleRecommendation.objects.all()
+    if kebele_ids is not None:
+        stored = stored.filter(kebele__in=kebele_ids)
+    if crops is not None:
+        stored = stored.filter(crop__in=crops)
+
+    fields = RECOMMENDATION_FIELDS[1:]
+    with transaction.atomic():
+        changed, stale = [], []
+        for obj in stored.select_for_update():
+            record = fresh.pop((obj.kebele, obj.crop), None)
+            if record is None:
+                stale.append(obj)
+            elif any(getattr(obj, f) != record[f] for f in fields):
+                for f in fields:
+                    setattr(obj, f, record[f])
+                changed.append(obj)
+        # rank is assigned by the re-rank below
+        new = [
+            KebeleRecommendation(kebele=kebele, rank=0, **{f: record[f] for f in RECOMMENDATION_FIELDS})
+            for (kebele, _), record in fresh.items()
+        ]
+        KebeleRecommendation.objects.bulk_update(changed, fields, batch_size=1000)
+        KebeleRecommendation.objects.bulk_create(new, batch_size=1000)
+        KebeleRecommendation.objects.filter(pk__in=[obj.pk for obj in stale]).delete()
+        reranked = rerank({obj.kebele for obj in changed + new + stale})
+        if changed or new or stale:
+            transaction.on_commit(invalidate_recommendations)
+    return {"updated": len(changed), "created": len(new), "deleted": len(stale), "reranked": reranked}
+
+
+def rescore_crop(name: str) -> dict:
+    """Recompute one crop's column across all kebeles after its requirements changed."""
+    return rescore(crops=[name])
+
+
+def rescore_kebele(kebele_id, crops=None) -> dict:
+    """Recompute one kebele's recommendations (only the given crops, if any) after its KebeleCrop rows changed."""
+    return rescore([kebele_id], crops)
+
+
+def rerank(kebele_ids) -> int:
+    """Renumber rank by distance within each of the given kebeles; returns the number of rows moved."""
+    kebele_ids = sorted(kebele_ids)
+    moved = 0
+    for start in range(0, len(kebele_ids), REFRESH_BATCH_KEBELES):
+        rows = (KebeleRecommendation.objects
+                .filter(kebele__in=kebele_ids[start:start + REFRESH_BATCH_KEBELES])
+                .order_by("kebele", "distance", "crop")
+                .only("pk", "kebele", "rank"))
+        updates = []
+        for _, kebele_rows in groupby(rows, key=lambda obj: obj.kebele):
+            for rank, obj in enumerate(kebele_rows, start=1):
+                if obj.rank != rank:
+                    obj.rank = rank
+                    updates.append(obj)
+        KebeleRecommendation.objects.bulk_update(updates, ["rank"], batch_size=1000)
+        moved += len(updates)
+    return moved
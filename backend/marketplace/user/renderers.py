@@ -0,0 +1,91 @@
+"""
+Renderers for the recommendation payloads (load_recommendations, farmer_home).
+
+FastJSONRenderer     application/json, the same JSON values as DRF's JSONRenderer
+                     but serialized by orjson (numpy scalars and arrays natively);
+                     falls back to the stdlib json module when orjson is missing.
+                     Dates and times go through DRF's encoder, so they are
+                     spelled exactly as DRF spells them; floats that need an
+                     exponent may be spelled differently (1e-05 vs 1e-5).
+ColumnarJSONRenderer application/vnd.shemeta.columnar+json, or ?format=columnar:
+                     every list of records becomes one array per field, so keys
+                     are sent once instead of once per row. ?precision=N rounds
+                     the float columns to N decimals.
+"""
+import json
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class _NumpyEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return super().default(obj)
+
+
+_encoder = _NumpyEncoder()
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=_encoder.default,
+            # datetimes are left to DRF's encoder so they follow its format, whatever the DRF version
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+    return json.dumps(data, cls=_NumpyEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+def columnar(data, precision=None):
+    """data with every non-empty list of dicts turned into {field: [values]} (recursively)."""
+    if isinstance(data, dict):
+        return {k: columnar(v, precision) for k, v in data.items()}
+    if isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+        fields = list(dict.fromkeys(k for row in data for k in row))
+        columns = {}
+        for field in fields:
+            values = [row.get(field) for row in data]
+            if values and isinstance(values[0], dict):
+                values = columnar(values, precision)
+            elif precision is not None:
+                values = [round(v, precision) if isinstance(v, float) else v for v in values]
+            columns[field] = values
+        return columns
+    return data
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    media_type = "application/vnd.shemeta.columnar+json"
+    format = "columnar"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        precision = None
+        request = (renderer_context or {}).get("request")
+        if request is not None and request.query_params.get("precision", "").isdigit():
+            precision = int(request.query_params["precision"])
+        return dumps(columnar(data, precision))
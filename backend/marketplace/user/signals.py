@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from crop.models import Crop, KebeleCrop
+from .recommender import invalidate_crop_matrix, invalidate_recommendations
+from .snapshot import discard_snapshot
+
+
+def _on_commit_too(invalidate):
+    """
+    Run invalidate now and again once the write commits: a snapshot or response
+    built from the data read in between (still the old rows) must not outlive it.
+    """
+    invalidate()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+def _crop_stale():
+    invalidate_crop_matrix()
+    invalidate_recommendations()
+    discard_snapshot()
+
+
+def _kebele_crop_stale():
+    invalidate_recommendations()
+    discard_snapshot()
+
+
+@receiver([post_save, post_delete], sender=Crop)
+def crop_changed(sender, **kwargs):
+    """Any Crop write makes the cached crop matrix, the snapshot and recommendation responses stale."""
+    _on_commit_too(_crop_stale)
+
+
+@receiver([post_save, post_delete], sender=KebeleCrop)
+def kebele_crop_changed(sender, **kwargs):
+    """KebeleCrop writes make the snapshot and cached recommendation responses stale."""
+    _on_commit_too(_kebele_crop_stale)
@@ -0,0 +1,200 @@
+"""
+Read-only, memory-mapped snapshot of the matcher inputs.
+
+A snapshot is a directory under settings.MODELS_DIR/snapshots holding plain .npy
+files: every KebeleCrop row's features as one float32 column per feature (rows
+grouped by kebele) for the matcher kernel and the same columns as float64 for the
+winners it rescores and echoes, the row -> kebele / crop codes, the kebele -> row
+offsets and the Crop requirement matrix, plus meta.json with the vocabularies. Workers open
+the files with np.load(mmap_mode="r"), so all of them share one copy through the
+page cache and a kebele's instances are slices (views) of the mapped columns;
+live matching then needs no database query at all.
+
+Snapshots are immutable. A reload writes a new directory and then atomically
+replaces the pointer file (recommendation_snapshot.json) naming the current one;
+readers notice the new pointer on their next call. Any Crop / KebeleCrop write
+removes the pointer (see signals.py), and callers fall back to the database until
+the next snapshot is written.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .matcher import AREA_FEATURES, CROP_FEATURES, AreaInstances, CropEnvMatcherForKebele
+
+POINTER_FILE = "recommendation_snapshot.json"
+SNAPSHOT_DIR = "snapshots"
+# The current snapshot and the one before it (workers may still be reading it)
+KEEP_SNAPSHOTS = 2
+# Feature rows of features.npy; KebeleCrop has no quality flag, stored as 1.0
+COLUMNS = AREA_FEATURES + ["data_quality_flag"]
+
+_lock = threading.Lock()
+_loaded = {"mtime": None, "snapshot": None}
+
+
+class RecommendationSnapshot:
+    """
+    The arrays of one snapshot directory. features (float32) and exact (float64) are
+    (len(COLUMNS), rows): each feature is a contiguous row, so slicing a kebele's
+    range copies nothing.
+    """
+
+    def __init__(self, path, features, exact, crop, kebele, offsets, crop_matrix, meta):
+        self.path = path
+        self.features = features
+        self.exact = exact
+        self.crop = crop
+        self.kebele = kebele
+        self.offsets = offsets
+        self.crop_matrix = crop_matrix
+        self.crop_names = meta["crop_names"]
+        self.kebele_names = meta["kebele_names"]
+        self.crops = meta["crops"]
+        self.created = meta["created"]
+        self.position = {kebele: i for i, kebele in enumerate(self.kebele_names)}
+        self._matcher = None
+
+    def __len__(self):
+        return self.features.shape[1]
+
+    def __contains__(self, kebele_id):
+        return kebele_id in self.position
+
+    @classmethod
+    def load(cls, path) -> "RecommendationSnapshot":
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(path, array("features"), array("exact"), array("crop"), array("kebele"), array("offsets"),
+                   array("crop_matrix"), meta)
+
+    @staticmethod
+    def write(area: AreaInstances, crop_df: pd.DataFrame, directory=None, is_current=None) -> str | None:
+        """
+        Write area (e.g. recommender.area_instances()) and crop_df (recommender.crop_frame())
+        as a new snapshot directory under directory (default MODELS_DIR/snapshots), then
+        make it the current one. Returns its path.
+
+        is_current() says whether the data area and crop_df were read from is still
+        the latest (see recommender.write_snapshot). It is asked before publishing,
+        and the new snapshot is dropped (None returned) if not. It is asked again
+        right after publishing, and the snapshot is withdrawn if a write slipped in
+        between, so a snapshot of stale data is never left current.
+        """
+        directory = directory or os.path.join(settings.MODELS_DIR, SNAPSHOT_DIR)
+        os.makedirs(directory, exist_ok=True)
+        name = str(time.time_ns())
+        tmp = os.path.join(directory, f"{name}.tmp")
+        os.makedirs(tmp)
+
+        # Group rows by kebele (stable, so each kebele keeps its row order)
+        order = np.argsort(area.kebele, kind="stable")
+        kebele = area.kebele[order].astype(np.int64)
+        offsets = np.searchsorted(kebele, np.arange(len(area.kebele_names) + 1)).astype(np.int64)
+        source = area.exact_columns()
+        exact = np.empty((len(COLUMNS), len(area)), dtype=np.float64)
+        for i, column in enumerate(COLUMNS):
+            exact[i] = source[column][order]
+        features = exact.astype(np.float32)
+        crop_matrix = np.array([crop_df[c].to_numpy(dtype=np.float64) for c in CROP_FEATURES])
+        crop_matrix = crop_matrix.reshape(len(CROP_FEATURES), -1)
+
+        for file, array in (("features", features), ("exact", exact), ("crop", area.crop[order].astype(np.int64)),
+                            ("kebele", kebele), ("offsets", offsets), ("crop_matrix", crop_matrix)):
+            np.save(os.path.join(tmp, f"{file}.npy"), array)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.time(),
+                "kebele_names": list(area.kebele_names),
+                "crop_names": list(area.crop_names),
+                "crops": crop_df["crop"].tolist(),
+            }, f)
+        if is_current is not None and not is_current():
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+        path = os.path.join(directory, name)
+        os.replace(tmp, path)
+
+        pointer = os.path.join(settings.MODELS_DIR, POINTER_FILE)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"path": os.path.relpath(path, settings.MODELS_DIR)}, f)
+        os.replace(f"{pointer}.tmp", pointer)
+        if is_current is not None and not is_current():
+            discard_snapshot()
+            return None
+        _prune(directory)
+        return path
+
+    def area(self, kebele_ids=None) -> AreaInstances:
+        """
+        The instances of the given kebeles (None = all) as matcher input. A single
+        kebele (the per-request case) or all of them are views of the mapped files;
+        several kebeles are gathered into one copy of just their rows.
+        """
+        if kebele_ids is None:
+            rows = slice(None)
+        else:
+            ranges = [(self.offsets[i], self.offsets[i + 1])
+                      for i in sorted({self.position[k] for k in kebele_ids if k in self.position})]
+            if len(ranges) == 1:
+                rows = slice(*ranges[0])
+            else:
+                rows = np.concatenate([np.arange(start, end) for start, end in ranges] or [np.empty(0, np.int64)])
+        columns = {column: self.features[i, rows] for i, column in enumerate(COLUMNS)}
+        exact = {column: self.exact[i, rows] for i, column in enumerate(COLUMNS)}
+        return AreaInstances(columns, self.crop[rows], self.crop_names, self.kebele[rows], self.kebele_names, exact)
+
+    def matcher(self) -> CropEnvMatcherForKebele:
+        """Matcher fitted on the snapshot's crop matrix (once per snapshot)."""
+        if self._matcher is None:
+            crop_df = pd.DataFrame(dict(zip(CROP_FEATURES, self.crop_matrix)))
+            crop_df.insert(0, "crop", self.crops)
+            self._matcher = CropEnvMatcherForKebele().fit(crop_df)
+        return self._matcher
+
+
+def _prune(directory):
+    """Remove all but the newest KEEP_SNAPSHOTS snapshots (and leftovers of failed writes)."""
+    names = sorted((n for n in os.listdir(directory) if n.isdigit()), key=int, reverse=True)
+    stale = names[KEEP_SNAPSHOTS:] + [n for n in os.listdir(directory) if n.endswith(".tmp")]
+    for name in stale:
+        # On Windows a directory still mapped by a worker cannot go yet; the next write retries
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def discard_snapshot():
+    """Stop serving the current snapshot (its data changed); readers fall back to the database."""
+    try:
+        os.remove(os.path.join(settings.MODELS_DIR, POINTER_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def get_snapshot() -> RecommendationSnapshot | None:
+    """The current snapshot, mapped once per process and remapped when the pointer changes; None if there is none."""
+    pointer = os.path.join(settings.MODELS_DIR, POINTER_FILE)
+    try:
+        mtime = os.path.getmtime(pointer)
+    except OSError:
+        return None
+    if _loaded["mtime"] != mtime:
+        with _lock:
+            if _loaded["mtime"] != mtime:
+                try:
+                    with open(pointer, encoding="utf-8") as f:
+                        path = os.path.join(settings.MODELS_DIR, json.load(f)["path"])
+                    _loaded["snapshot"] = RecommendationSnapshot.load(path)
+                except (OSError, ValueError, KeyError):
+                    # discarded or replaced while reading; the database answers this one
+                    return None
+                _loaded["mtime"] = mtime
+    return _loaded["snapshot"]
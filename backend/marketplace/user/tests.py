@@ -1,3 +1,660 @@
-from django.test import TestCase
+import base64
+import datetime
+import decimal
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.core.management import CommandError, call_command
+from django.db import connection, models
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from crop.admin import CropAdmin, KebeleCropAdmin
+from crop.models import Crop, KebeleCrop
+from jobs.models import Job
+from jobs.queue import claim, run
+from marketplace import metrics
+
+from .models import CropRequirement, FarmerExporterMatch, Kebele, KebeleRecommendation, LandDetail, User
+from .async_views import exporter_home_async_view, farmer_home_async_view
+from .bench import synthetic_crops, synthetic_rows
+from .matcher import (
+    AREA_FEATURES, COMPONENTS, AreaInstances, CropEnvMatcherForKebele, Weights, weight_coefficients,
+)
+from .neighbors import KebeleNeighborIndex
+from .recommender import (
+    CROP_VERSION_KEY, DATA_VERSION_KEY, area_instances, crop_frame, data_version, get_matcher,
+    invalidate_recommendations, kebeles_without_data, query_kebeles, recommendation_responses, refresh_recommendations,
+    rescore, write_snapshot,
+)
+from .renderers import FastJSONRenderer
+from .snapshot import SNAPSHOT_DIR, RecommendationSnapshot, get_snapshot
+from .views import (
+    exporter_home_view, farmer_home_view, farmer_recommendations, load_recommendations, post_crop_requirement,
+)
+
+
+# Snapshots and other MODELS_DIR artifacts the code under test writes go to a
+# scratch directory, never the developer's models/
+MODELS_DIR = tempfile.mkdtemp(prefix="shemeta-test-models-")
+
+
+def tearDownModule():
+    shutil.rmtree(MODELS_DIR, ignore_errors=True)
+
+
+def bump_in_other_process(name):
+    """Bump version token name from a separate Python process, as a command or the job worker would."""
+    subprocess.run([sys.executable, "-c", (
+        "from django.conf import settings; settings.configure(MODELS_DIR=%r); "
+        "from user.versions import bump_version; bump_version(%r)" % (settings.MODELS_DIR, name)
+    )], cwd=os.path.dirname(os.path.dirname(__file__)), check=True)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class FarmerHomeQueryCountTests(TestCase):
+    """farmer_home must not issue queries per plot or per match."""
+
+    def setUp(self):
+        self.farmer = User.objects.create_user(username="farmer", password="x", role="FARMER")
+        self.exporter = User.objects.create_user(username="exporter", password="x", role="EXPORTER")
+
+    def add_plots_and_matches(self, n):
+        for i in range(n):
+            kebele = Kebele.objects.create(kebele_id=f"kebele-{self.farmer.land_details.count()}")
+            KebeleRecommendation.objects.create(kebele=kebele.kebele_id, crop="Teff", distance=5.0, rank=1, best_area_index=0)
+            land = LandDetail.objects.create(
+                user=self.farmer, region="Oromia", location="Adama, Ethiopia (8.54, 39.27)",
+                plot_size=1.5, soil_type="vertisol", kebele_id=kebele,
+            )
+            requirement = CropRequirement.objects.create(
+                crop_name="teff", quantity=10, price_per_kg=50, harvest_date=datetime.date(2026, 1, 1), region="Oromia",
+            )
+            FarmerExporterMatch.objects.create(
+                farmer=self.farmer, exporter=self.exporter, crop_requirement=requirement,
+                land_detail=land, crop_name="teff",
+            )
+
+    def get(self):
+        request = APIRequestFactory().get("/api/user/farmer_home/")
+        force_authenticate(request, user=self.farmer)
+        return farmer_home_view(request)
+
+    def test_constant_query_count(self):
+        # lands, recommendations, matches
+        for n in (1, 5):
+            self.add_plots_and_matches(n)
+            with self.assertNumQueries(3):
+                response = self.get()
+            self.assertEqual(len(response.data["land_details"]), self.farmer.land_details.count())
+            self.assertEqual(len(response.data["matches"]), self.farmer.farmer_matches.count())
+            self.assertEqual(set(response.data["recommendations"]), set(Kebele.objects.values_list("kebele_id", flat=True)))
+            self.assertEqual(response.data["matches"][0]["exporter"], "exporter")
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class LoadRecommendationsConditionalGetTests(TestCase):
+    """load_recommendations answers revalidation from its ETag without hitting the database."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="farmer", password="x", role="FARMER")
+        KebeleRecommendation.objects.create(kebele="k1", crop="Teff", distance=5.0, rank=1, best_area_index=0)
+
+    def get(self, **headers):
+        request = APIRequestFactory().get("/api/user/load_recommendations/", {"kebele_id": "k1"}, headers=headers)
+        force_authenticate(request, user=self.user)
+        return load_recommendations(request)
+
+    def test_etag_and_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"][0]["crop"], "Teff")
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+        self.assertEqual(self.get(if_modified_since=response["Last-Modified"]).status_code, 304)
+
+        # A KebeleCrop write moves the data version: new ETag, fresh body
+        Kebele.objects.create(kebele_id="k2")
+        KebeleCrop.objects.create(kebele_id="k2", crop_id="Teff", **{f.name: 0.0 for f in KebeleCrop._meta.fields
+                                                                     if f.name not in ("id", "kebele", "crop")})
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # So does a load in another process (a command or the job worker)
+        etag = response["ETag"]
+        bump_in_other_process(DATA_VERSION_KEY)
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_etag_depends_on_representation(self):
+        etags = set()
+        for params in ({}, {"format": "columnar"}, {"format": "columnar", "precision": "2"}):
+            request = APIRequestFactory().get("/api/user/load_recommendations/", {"kebele_id": "k1", **params})
+            force_authenticate(request, user=self.user)
+            etags.add(load_recommendations(request)["ETag"])
+        self.assertEqual(len(etags), 3)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer sends the same JSON as DRF's JSONRenderer."""
+
+    def test_same_output_as_drf(self):
+        data = {
+            "created_at": datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            "naive": datetime.datetime(2026, 1, 2, 3, 4, 5, 678901),
+            "harvest_date": datetime.date(2026, 1, 2),
+            "at": datetime.time(3, 4, 5, 678901),
+            "price": decimal.Decimal("12.50"),
+            "records": [{"crop": "ጤፍ", "distance": np.float64(0.1), "rank": np.int64(1),
+                         "ndvi_peak": np.float32(0.5), "flag": None}],
+            "array": np.arange(3),
+        }
+        # Byte for byte, as long as no float needs an exponent (1e-05 vs 1e-5)
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        tiny = {"distance": 1e-05}
+        self.assertEqual(json.loads(FastJSONRenderer().render(tiny)), json.loads(JSONRenderer().render(tiny)))
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class BorrowedRecommendationsTests(TestCase):
+    """Only kebeles without any data of their own borrow from their neighbours."""
+
+    def setUp(self):
+        models_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(models_dir.cleanup)
+        settings_override = override_settings(MODELS_DIR=models_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # k1 has data but no crop within reach; k2 a good match; k3 nothing at all
+        KebeleRecommendation.objects.create(kebele="k1", crop="Teff", distance=500.0, rank=1, best_area_index=0)
+        KebeleRecommendation.objects.create(kebele="k2", crop="Maize", distance=5.0, rank=1, best_area_index=0)
+        kebeles = ["k1", "k2", "k3"]
+        KebeleNeighborIndex(kebeles, None, np.eye(3), [], np.empty((0, 2))).save()
+
+    def test_only_kebeles_without_data_borrow(self):
+        self.assertEqual(kebeles_without_data(["k1", "k2", "k3"]), ["k3"])
+        for results in (recommendation_responses(["k1", "k3"]),
+                        farmer_recommendations({"k1": None, "k3": None}, max_distance=100.0)):
+            self.assertEqual(results["k1"], [])
+            self.assertEqual([(r["crop"], r["borrowed_from"]) for r in results["k3"]], [("Maize", "k2")])
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class AsyncViewsTests(TransactionTestCase):
+    """
+    The async dashboards answer exactly like the sync ones, and only with a valid JWT.
+    Their queries run on other threads' connections, so the data must be committed.
+    """
+
+    def setUp(self):
+        self.farmer = User.objects.create_user(username="farmer", password="x", role="FARMER")
+        self.exporter = User.objects.create_user(username="exporter", password="x", role="EXPORTER")
+        for i in range(3):
+            kebele = Kebele.objects.create(kebele_id=f"k{i}")
+            KebeleRecommendation.objects.create(kebele=kebele.kebele_id, crop="Teff", distance=5.0 + i, rank=1,
+                                                best_area_index=0)
+            land = LandDetail.objects.create(user=self.farmer, region="Oromia", location="Adama, Ethiopia (8.54, 39.27)",
+                                             plot_size=1.5, soil_type="vertisol", kebele_id=kebele)
+            requirement = CropRequirement.objects.create(
+                exporter=self.exporter, crop_name="teff", quantity=10 + i, price_per_kg=50,
+                harvest_date=datetime.date(2026, 1, 1), region="Oromia",
+            )
+            FarmerExporterMatch.objects.create(farmer=self.farmer, exporter=self.exporter, crop_requirement=requirement,
+                                               land_detail=land, crop_name="teff")
+
+    def sync_body(self, view, user, **params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=user)
+        return json.loads(view(request).render().content)
+
+    def async_response(self, view, token=None, **params):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return async_to_sync(view)(AsyncRequestFactory().get("/", params, headers=headers))
+
+    def test_same_body_as_sync_views(self):
+        for view, async_view, user, params in (
+            (farmer_home_view, farmer_home_async_view, self.farmer, {}),
+            (exporter_home_view, exporter_home_async_view, self.exporter, {"limit": 2}),
+        ):
+            response = self.async_response(async_view, RefreshToken.for_user(user).access_token, **params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), self.sync_body(view, user, **params))
+
+    def test_401_without_valid_jwt(self):
+        for async_view in (farmer_home_async_view, exporter_home_async_view):
+            self.assertEqual(self.async_response(async_view).status_code, 401)
+            self.assertEqual(self.async_response(async_view, "not-a-token").status_code, 401)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class MetricsTests(TestCase):
+    """The metrics middleware records every API request; /api/metrics/ exposes them to staff only."""
+
+    ROUTE = "api/user/load_recommendations/"
+    # HELP / TYPE comments and samples of the Prometheus text exposition format
+    LINE = re.compile(r'# (HELP \w+ .+|TYPE \w+ (counter|histogram))|\w+(\{(\w+="[^"]*",?)+\})? [0-9.e+-]+')
+
+    def setUp(self):
+        self.addCleanup(setattr, metrics, "registry", metrics.registry)
+        metrics.registry = metrics.Registry()
+        self.farmer = User.objects.create_user(username="farmer", password="x", role="FARMER")
+        self.staff = User.objects.create_user(username="admin", password="x", is_staff=True)
+        KebeleRecommendation.objects.create(kebele="k1", crop="Teff", distance=5.0, rank=1, best_area_index=0)
+        # No response cached by another test for the same data version
+        invalidate_recommendations()
+        self.tokens = {user: RefreshToken.for_user(user).access_token for user in (self.farmer, self.staff)}
+
+    def get(self, path, user=None, **params):
+        headers = {"Authorization": f"Bearer {self.tokens[user]}"} if user else {}
+        return self.client.get(path, params, headers=headers)
+
+    def samples(self, text):
+        values = {}
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                values[name] = float(value)
+        return values
+
+    def test_exposition(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(2):
+                self.assertEqual(self.get(f"/{self.ROUTE}", self.farmer, kebele_id="k1").status_code, 200)
+        # (read now: later requests reset the connection's query log)
+        n_queries = len(queries)
+
+        self.assertEqual(self.get("/api/metrics/").status_code, 401)
+        self.assertEqual(self.get("/api/metrics/", self.farmer).status_code, 403)
+        response = self.get("/api/metrics/", self.staff)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        text = response.content.decode()
+        for line in text.splitlines():
+            self.assertRegex(line, f"^(?:{self.LINE.pattern})$")
+
+        values = self.samples(text)
+        route = f'route="{self.ROUTE}"'
+        self.assertEqual(values[f'shemeta_requests_total{{{route},method="GET",status="200"}}'], 2)
+        for name in metrics.Registry.HISTOGRAMS:
+            buckets = [value for key, value in values.items() if key.startswith(f"shemeta_{name}_bucket{{{route},")]
+            self.assertEqual(buckets, sorted(buckets), name)  # cumulative
+            self.assertEqual(buckets[-1], values[f"shemeta_{name}_count{{{route}}}"])
+            self.assertEqual(buckets[-1], 2)
+        self.assertEqual(values[f"shemeta_db_queries_sum{{{route}}}"], n_queries)
+        # The metrics endpoint itself and the 401/403 answers are not API routes of the apps
+        self.assertNotIn('route="api/metrics/"', text)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class ExporterHomePaginationTests(TestCase):
+    """exporter_home only shows the exporter's own data, a page at a time."""
+
+    def setUp(self):
+        self.exporter = User.objects.create_user(username="exporter", password="x", role="EXPORTER")
+        other = User.objects.create_user(username="other", password="x", role="EXPORTER")
+        for i in range(5):
+            CropRequirement.objects.create(
+                exporter=self.exporter, crop_name="teff" if i % 2 else "coffee", quantity=i, price_per_kg=50,
+                harvest_date=datetime.date(2026, 1, 1), region="Oromia",
+            )
+        CropRequirement.objects.create(
+            exporter=other, crop_name="teff", quantity=1, price_per_kg=50,
+            harvest_date=datetime.date(2026, 1, 1), region="Oromia",
+        )
+
+    def get(self, **params):
+        request = APIRequestFactory().get("/api/user/exporter_home/", params)
+        force_authenticate(request, user=self.exporter)
+        return exporter_home_view(request)
+
+    def test_pages_cover_own_requirements_once(self):
+        seen, cursor = [], None
+        while True:
+            data = self.get(limit=2, **({"requirements_cursor": cursor} if cursor else {})).data
+            seen += [req["id"] for req in data["requirements"]]
+            cursor = data["next_requirements_cursor"]
+            if cursor is None:
+                break
+        own = list(CropRequirement.objects.filter(exporter=self.exporter).order_by("-created_at", "-id")
+                   .values_list("id", flat=True))
+        self.assertEqual(seen, own)
+        self.assertEqual(data["total_requirements"], 5)
+
+    def test_filters_and_bad_cursor(self):
+        data = self.get(crop="teff").data
+        self.assertEqual([req["crop_name"] for req in data["requirements"]], ["teff", "teff"])
+        self.assertEqual(self.get(requirements_cursor="nope").status_code, 400)
+        # Well-formed base64 JSON, but not a (value, id) pair encode_cursor would make
+        for raw in ('["2026-01-01",[1]]', '["2026-01-01",null]', '[{"a":1},1]'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            self.assertEqual(self.get(requirements_cursor=cursor).status_code, 400, raw)
+            self.assertEqual(self.get(matches_cursor=cursor).status_code, 400, raw)
+
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class PostCropRequirementTests(TestCase):
+    """post_crop_requirement matches each farmer of the region once, in a constant number of queries."""
+
+    def setUp(self):
+        self.exporter = User.objects.create_user(username="exporter", password="x", role="EXPORTER")
+
+    def add_farmers(self, n, plots=2):
+        for i in range(n):
+            farmer = User.objects.create_user(username=f"farmer{User.objects.count()}", password="x", role="FARMER")
+            for _ in range(plots):
+                LandDetail.objects.create(user=farmer, region="Oromia", location="Adama", plot_size=1.0,
+                                          soil_type="vertisol")
+
+    def post(self, **extra):
+        request = APIRequestFactory().post("/api/user/post_crop_requirement/", {
+            "cropName": "teff", "quantity": 10, "pricePerKg": 50, "harvestDate": "2026-01-01",
+            "region": "Oromia", **extra,
+        }, format="json")
+        force_authenticate(request, user=self.exporter)
+        return post_crop_requirement(request)
+
+    def test_constant_query_count(self):
+        self.add_farmers(1)
+        with CaptureQueriesContext(connection) as one:
+            self.post()
+        self.add_farmers(9)
+        with self.assertNumQueries(len(one)):
+            response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["matched_farmers"]), 10)
+        requirement = CropRequirement.objects.latest("id")
+        self.assertEqual(requirement.matches.count(), 10)
+        # each farmer is matched against their first plot
+        self.assertEqual(set(requirement.matches.values_list("land_detail_id", flat=True)),
+                         {farmer.land_details.order_by("id").first().id
+                          for farmer in User.objects.filter(role="FARMER")})
+
+    def test_background(self):
+        self.add_farmers(3)
+        response = self.post(background=True)
+        self.assertEqual(response.status_code, 202)
+        body = json.loads(response.content)
+        self.assertEqual(FarmerExporterMatch.objects.count(), 0)
+
+        run(claim("test"))
+        job = Job.objects.get(pk=body["job"]["id"])
+        self.assertEqual((job.status, job.result["matched"]), (Job.SUCCEEDED, 3))
+        self.assertEqual(FarmerExporterMatch.objects.filter(crop_requirement_id=body["requirement_id"]).count(), 3)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class RecommendationSnapshotTests(TestCase):
+    """query_kebeles answers from the snapshot, without queries, exactly as from the database."""
+
+    def setUp(self):
+        models_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(models_dir.cleanup)
+        settings_override = override_settings(MODELS_DIR=models_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        Crop.objects.create(name="Teff", **{f.name: 100 for f in Crop._meta.fields if f.name not in ("id", "name")})
+        for kebele, rainfall in (("k1", 100.0), ("k2", 80.0)):
+            Kebele.objects.create(kebele_id=kebele)
+            KebeleCrop.objects.create(kebele_id=kebele, crop_id="Teff", **{
+                f.name: rainfall for f in KebeleCrop._meta.fields if f.name not in ("id", "kebele", "crop")
+            })
+
+    def test_snapshot_matches_database(self):
+        from_db = query_kebeles(["k1", "k2", "k3"], max_distance=float("inf"))
+        self.assertEqual([len(from_db[k]) for k in ("k1", "k2", "k3")], [1, 1, 0])
+        write_snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(query_kebeles(["k1", "k2", "k3"], max_distance=float("inf")), from_db)
+            self.assertEqual(query_kebeles(["k2"], max_distance=float("inf"))["k2"], from_db["k2"])
+
+        # A KebeleCrop write retires the snapshot
+        KebeleCrop.objects.filter(kebele_id="k1").first().save()
+        self.assertIsNone(get_snapshot())
+
+    def test_snapshot_of_changed_data_is_not_published(self):
+        # The data moved on (e.g. a load in another process) while the tables were read
+        version = data_version()
+        area, crop_df = area_instances(), crop_frame()
+        bump_in_other_process(DATA_VERSION_KEY)
+        self.assertIsNone(RecommendationSnapshot.write(area, crop_df, is_current=lambda: data_version() == version))
+        self.assertIsNone(get_snapshot())
+        self.assertEqual(os.listdir(os.path.join(settings.MODELS_DIR, SNAPSHOT_DIR)), [])
+
+        # ... or just after it was published: it is withdrawn again
+        answers = iter([True, False])
+        self.assertIsNone(RecommendationSnapshot.write(area, crop_df, is_current=lambda: next(answers)))
+        self.assertIsNone(get_snapshot())
+        self.assertIsNotNone(write_snapshot())
+
+    def test_float64_values_are_echoed_exactly(self):
+        # Not representable in float32: the float32 kernel must not leak into the results
+        KebeleCrop.objects.filter(kebele_id="k1").update(seasonal_rainfall_total=801.121652532672,
+                                                         ndvi_peak=0.3841806014799134)
+        rows = KebeleCrop.objects.filter(kebele_id="k1").values("crop", *AREA_FEATURES)
+        expected = get_matcher().query_kebele([dict(row, data_quality_flag=1.0) for row in rows],
+                                              max_distance=float("inf")).to_dict(orient="records")
+        self.assertEqual(expected[0]["seasonal_rainfall_total"], 801.121652532672)
+        self.assertEqual(query_kebeles(["k1"], max_distance=float("inf"))["k1"], expected)
+        write_snapshot()
+        self.assertEqual(query_kebeles(["k1"], max_distance=float("inf"))["k1"], expected)
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class ScoreSuitabilityResumeTests(TestCase):
+    """score_suitability does not resume over shards scored on other data."""
+
+    def test_data_change_blocks_resume(self):
+        Kebele.objects.create(kebele_id="k1")
+        KebeleCrop.objects.create(kebele_id="k1", crop_id="Teff", **{
+            f.name: 1.0 for f in KebeleCrop._meta.fields if f.name not in ("id", "kebele", "crop")
+        })
+        out = tempfile.mkdtemp(prefix="shemeta-test-suitability-")
+        self.addCleanup(shutil.rmtree, out, ignore_errors=True)
+        # The only shard is already done, so no worker processes are started
+        open(os.path.join(out, "shard=00000.parquet"), "wb").close()
+        call_command("score_suitability", out=out, processes=1, stdout=io.StringIO())
+        call_command("score_suitability", out=out, processes=1, stdout=io.StringIO())
+
+        # A reload of the features (load_kebele_crops, ingest_features) moves the data version
+        KebeleCrop.objects.get().save()
+        with self.assertRaisesMessage(CommandError, "holds a run with"):
+            call_command("score_suitability", out=out, processes=1, stdout=io.StringIO())
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class CropVersionTests(TestCase):
+    """The fitted matcher follows Crop changes made by any process, not just this one."""
+
+    def test_refit_after_another_process_bumps_the_version(self):
+        Crop.objects.create(name="Teff", **{f.name: 100 for f in Crop._meta.fields if f.name not in ("id", "name")})
+        matcher = get_matcher()
+        self.assertIs(get_matcher(), matcher)
+        # A loader run by a command or the job worker: no signal here, only the shared token moves
+        Crop.objects.bulk_create([Crop(name="Maize", **{f.name: 100 for f in Crop._meta.fields
+                                                        if f.name not in ("id", "name")})])
+        bump_in_other_process(CROP_VERSION_KEY)
+        self.assertIsNot(get_matcher(), matcher)
+        self.assertEqual(sorted(get_matcher().crop_codes), ["Maize", "Teff"])
+
+
+@override_settings(MODELS_DIR=MODELS_DIR)
+class RescoreTests(TestCase):
+    """Admin-scoped rescores leave exactly the rows a full refresh_recommendations would."""
+
+    def setUp(self):
+        crop_df = synthetic_crops(6, seed=3)
+        integer = {f.name for f in Crop._meta.fields if isinstance(f, models.IntegerField)}
+        Crop.objects.bulk_create([
+            Crop(name=row.pop("crop"), **{k: round(v) if k in integer else v for k, v in row.items()})
+            for row in crop_df.to_dict(orient="records")
+        ])
+        rows = synthetic_rows(crop_df["crop"].tolist(), n_kebeles=5, crops_per_kebele=4, instances_per_crop=1, seed=4)
+        Kebele.objects.bulk_create([Kebele(kebele_id=k) for k in sorted({row[0] for row in rows})])
+        KebeleCrop.objects.bulk_create([KebeleCrop(**dict(zip(["kebele_id", "crop_id", *AREA_FEATURES], row)))
+                                        for row in rows])
+        refresh_recommendations()
+
+    @staticmethod
+    def stored():
+        return list(KebeleRecommendation.objects.order_by("kebele", "rank")
+                    .values_list("kebele", "rank", "crop", "distance"))
+
+    def test_rescore_matches_refresh(self):
+        crop_admin, kebele_crop_admin = CropAdmin(Crop, admin.site), KebeleCropAdmin(KebeleCrop, admin.site)
+        before = self.stored()
+
+        crop = Crop.objects.order_by("name").first()
+        crop.seasonal_rainfall_total_opt += 200
+        crop.mean_temp_season_max += 5
+        crop.save()
+        rescore(**crop_admin.scope([crop]))
+
+        edited, deleted = KebeleCrop.objects.order_by("pk")[:2]
+        edited.seasonal_rainfall_total *= 0.5
+        edited.ndvi_peak = 0.0
+        edited.save()
+        rescore(**kebele_crop_admin.scope([edited]))
+        scope = kebele_crop_admin.scope([deleted])
+        deleted.delete()
+        rescore(**scope)
+
+        rescored = self.stored()
+        self.assertNotEqual(rescored, before)
+        refresh_recommendations()
+        self.assertEqual(rescored, self.stored())
+
+
+class MatcherTestData:
+    """Synthetic crops and instances (see bench.py) shared by the matcher equivalence tests."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.crop_df = synthetic_crops(8, seed=1)
+        cls.rows = synthetic_rows(cls.crop_df["crop"].tolist(), n_kebeles=6, crops_per_kebele=6,
+                                  instances_per_crop=3, seed=2)
+        cls.dicts = [dict(zip(["kebele", "crop", *AREA_FEATURES], row), data_quality_flag=0.8) for row in cls.rows]
+        cls.matcher = CropEnvMatcherForKebele().fit(cls.crop_df)
+
+
+class VectorizedDistanceTests(MatcherTestData, SimpleTestCase):
+    """The vectorized kernel (_c_* / _p_*) gives exactly the distances of the scalar _distance_one."""
+
+    def test_distance_matrix_matches_distance_one(self):
+        for weights in (Weights(), Weights(ndvi=0.3, rainfall=2.0, sow_window=1.5, area_quality_alpha=0.5)):
+            matcher = CropEnvMatcherForKebele(weights).fit(self.crop_df)
+            expected = np.array([[matcher._distance_one(crop, area) for area in self.dicts]
+                                 for _, crop in self.crop_df.iterrows()])
+            np.testing.assert_array_equal(matcher.distance_matrix(self.dicts), expected)
+
+    def test_components_times_weights_match_penalties(self):
+        # _p_* are the _c_* components scaled by weight_coefficients, as sweep relies on
+        C = {k: v[:, None] for k, v in self.matcher.crop_arrays.items()}
+        A = {k: v[None, :] for k, v in AreaInstances.from_dicts(self.dicts).columns.items()}
+        X = np.stack([getattr(self.matcher, "_c_" + c)(C, A) for c in COMPONENTS])
+        total = np.tensordot(weight_coefficients([self.matcher.w])[0], X, axes=1)
+        P = self.matcher._group_penalties(C, A)
+        np.testing.assert_allclose(total, sum(P.values()), rtol=1e-12)
+
+
+class PrunedQueryTests(MatcherTestData, SimpleTestCase):
+    """prune=True and top_k give the unpruned results (cut to top_k)."""
+
+    def assertSameResults(self, actual, expected):
+        self.assertEqual(actual.keys(), expected.keys())
+        for kebele in expected:
+            pd.testing.assert_frame_equal(actual[kebele].reset_index(drop=True),
+                                          expected[kebele].reset_index(drop=True), check_exact=True)
+
+    def test_pruned_and_top_k_match_unpruned(self):
+        for weights in (Weights(), Weights(area_quality_alpha=0.5)):
+            matcher = CropEnvMatcherForKebele(weights).fit(self.crop_df)
+            area = AreaInstances.from_dicts(self.dicts)
+            every = matcher.query_kebeles(area, max_distance=np.inf, explain=True)
+            distances = np.concatenate([df["distance"].to_numpy() for df in every.values()])
+            # No cut, a cut that drops some crops, and one that drops whole kebeles
+            for max_distance in (np.inf, *np.percentile(distances, [50, 5])):
+                full = matcher.query_kebeles(area, max_distance=max_distance, explain=True)
+                self.assertSameResults(matcher.query_kebeles(area, max_distance=max_distance, prune=True,
+                                                             explain=True), full)
+                for top_k in (1, 3):
+                    expected = {kebele: df.head(top_k) for kebele, df in full.items()}
+                    self.assertSameResults(matcher.query_kebeles(area, max_distance=max_distance, top_k=top_k,
+                                                                 explain=True), expected)
+
+
+class SweepTests(MatcherTestData, SimpleTestCase):
+    """sweep's metrics are those of the rankings query_kebeles gives under each configuration."""
+
+    def rankings(self, weights):
+        matcher = CropEnvMatcherForKebele(weights).fit(self.crop_df)
+        results = matcher.query_kebeles(self.dicts, max_distance=np.inf)
+        return {kebele: df["crop"].tolist() for kebele, df in results.items()}
+
+    def test_sweep_matches_query_kebeles(self):
+        k = 3
+        configs = [Weights(ndvi=2.0), Weights(rainfall=0.2, gdd=3.0), Weights(area_quality_alpha=0.5)]
+        relevance = {(row[0], row[1]): float(i % 4) for i, row in enumerate(self.rows)}
+        swept = self.matcher.sweep(self.dicts, configs, relevance=relevance, k=k)
+
+        reference = self.rankings(self.matcher.w)
+        for (_, row), weights in zip(swept.iterrows(), configs):
+            ranking = self.rankings(weights)
+            overlap, spearman, ndcg = [], [], []
+            for kebele, ref in reference.items():
+                crops = ranking[kebele]
+                overlap.append(len(set(ref[:k]) & set(crops[:k])) / min(k, len(ref)))
+                n = len(ref)
+                d2 = sum((crops.index(crop) - i) ** 2 for i, crop in enumerate(ref))
+                spearman.append(1 - 6 * d2 / (n * (n ** 2 - 1)))
+                gains = [relevance.get((kebele, crop), 0.0) for crop in crops]
+                ideal = sorted(gains, reverse=True)[:k]
+                if sum(ideal):
+                    ndcg.append(sum(g / np.log2(i + 2) for i, g in enumerate(gains[:k]))
+                                / sum(g / np.log2(i + 2) for i, g in enumerate(ideal)))
+            self.assertAlmostEqual(row["overlap@k"], np.mean(overlap))
+            self.assertAlmostEqual(row["spearman"], np.mean(spearman))
+            self.assertAlmostEqual(row["ndcg@k"], np.mean(ndcg))
+            self.assertEqual(row["gdd"], weights.gdd)
+
+
+class Float32InstancesTests(MatcherTestData, SimpleTestCase):
+    """float32 AreaInstances only change the kernel's distances, within float32 rounding."""
+
+    # float32 keeps ~7 significant digits; the penalty terms add up a few roundings of that
+    RTOL = 1e-5
+
+    def test_kernel_within_tolerance_and_results_exact(self):
+        rows = [(*row, 0.8) for row in self.rows]
+        float32 = AreaInstances.from_values_list(rows)
+        float64 = AreaInstances.from_values_list(rows, dtype=np.float64)
+        self.assertEqual(float32["ndvi_peak"].dtype, np.float32)
+        np.testing.assert_allclose(self.matcher.distance_matrix(float32), self.matcher.distance_matrix(float64),
+                                   rtol=self.RTOL)
+
+        # Winners are rescored and echoed from the float64 source: identical results
+        expected = self.matcher.query_kebeles(float64, max_distance=np.inf, explain=True)
+        for kwargs in ({}, {"prune": True}, {"top_k": 3}):
+            actual = self.matcher.query_kebeles(float32, max_distance=np.inf, explain=True, **kwargs)
+            for kebele, df in expected.items():
+                pd.testing.assert_frame_equal(actual[kebele], df.head(kwargs.get("top_k", len(df))), check_exact=True)
 
-# Create your tests here.
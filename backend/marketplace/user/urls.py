@@ -10,6 +10,7 @@ from .views import (
     post_crop_requirement,
     exporter_home_view
 )
+from .async_views import farmer_home_async_view, exporter_home_async_view
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -22,5 +23,8 @@ urlpatterns = [
     path('load_recommendations/',load_recommendations),
     path('farmer_home/',farmer_home_view),
     path('post_crop_requirement/',post_crop_requirement),
-    path('exporter_home/',exporter_home_view)
+    path('exporter_home/',exporter_home_view),
+    # async variants, for the ASGI app (marketplace.asgi)
+    path('farmer_home_async/',farmer_home_async_view),
+    path('exporter_home_async/',exporter_home_async_view),
 ]
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Data version tokens shared by every process on the host.
+
+Crop and recommendation data are changed by web workers, by management commands
+(load_crops, ingest_features, ...) and by the run_jobs worker, and read by all
+web workers, so the tokens that say "this changed" cannot live in a per-process
+cache. Each token is a small file under settings.MODELS_DIR/versions holding a
+time_ns: bumping one atomically replaces the file, reading one is a single small
+file read (no database query).
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+VERSION_DIR = "versions"
+# os.replace fails on Windows while another process has the file open; retry briefly
+REPLACE_ATTEMPTS = 5
+
+
+def _path(name):
+    return os.path.join(settings.MODELS_DIR, VERSION_DIR, name)
+
+
+def get_version(name) -> int:
+    """Current value of token name, created on first use."""
+    try:
+        with open(_path(name), encoding="ascii") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return bump_version(name)
+
+
+def bump_version(name) -> int:
+    """Move token name to a new value (time_ns) and return it."""
+    version = time.time_ns()
+    path = _path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="ascii") as f:
+        f.write(str(version))
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(tmp, path)
+            break
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.01)
+    return version
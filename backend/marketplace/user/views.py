@@ -1,21 +1,31 @@
 from django.contrib.auth import get_user_model
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import LandDetail, CropRequirement
-from .gee import get_kebele_id_from_location_string
 from .models import Kebele
-import pandas as pd
-from crop.models import Crop, KebeleCrop
-from .matcher import CropEnvMatcherForKebele, Weights
+from .matches import match_farmers
+from .recommender import (
+    borrowed_recommendations, cached_response, data_version, kebeles_without_data, query_kebeles,
+    recommendation_responses, stored_recommendations,
+)
+from .renderers import ColumnarJSONRenderer, FastJSONRenderer
+from jobs.queue import enqueue
+from jobs.views import accepted
 import random
 
 User = get_user_model()
 
+# JSON by default; columnar via Accept: application/vnd.shemeta.columnar+json or ?format=columnar
+RECOMMENDATION_RENDERERS = [FastJSONRenderer, ColumnarJSONRenderer, BrowsableAPIRenderer]
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_view(request):
@@ -101,241 +111,134 @@ def add_land_detail_view(request):
     )
     return Response({'success': True, 'message': 'Land detail saved successfully.'}, status=status.HTTP_201_CREATED)
 
+def _not_modified(request, etag, last_modified):
+    """Conditional GET: If-None-Match wins over If-Modified-Since when both are sent."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+def _representation(request):
+    """The negotiated format, plus the precision the columnar renderer applies."""
+    representation = request.accepted_renderer.format
+    precision = request.query_params.get('precision', '')
+    if representation == ColumnarJSONRenderer.format and precision.isdigit():
+        representation += f"-p{int(precision)}"
+    return representation
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(RECOMMENDATION_RENDERERS)
 def load_recommendations(request):
     """
-    Loads crop and kebele crop data from the database,
-    runs matcher2.py logic, and returns recommended crops for the user's kebele.
+    Returns the recommended crops for the user's kebele from the precomputed
+    KebeleRecommendation table (refreshed whenever crop data is loaded).
     Expects kebele_id as a query param (?kebele_id=xxxx).
+    A kebele without KebeleCrop data borrows the recommendations of its most similar
+    kebeles (each record then carries borrowed_from).
+    With ?explain=1 the ranking is computed live and each crop carries its per-group
+    penalties (p_ndvi, p_rain, ...), plus the matcher's counters under "stats".
+
+    Responses carry an ETag (data version and representation) / Last-Modified and are
+    cached per kebele until Crop or KebeleCrop data changes; a matching
+    If-None-Match (or If-Modified-Since) gets a 304 without touching the database.
+
+    ?format=columnar (or the columnar Accept type) sends one array per field
+    instead of a list of records; ?precision=N rounds its floats (see renderers.py).
     """
     kebele_id = request.query_params.get('kebele_id')
     if not kebele_id:
         return Response({'success': False, 'message': 'Missing kebele_id.'}, status=400)
 
-    # Get all KebeleCrop entries for this kebele
-    area_instances = []
-    for kc in KebeleCrop.objects.filter(kebele=kebele_id):
-        area_dict = {
-            "crop": kc.crop.name if hasattr(kc.crop, "name") else str(kc.crop),  # <-- FIX HERE
-            "ndvi_peak": kc.ndvi_peak,
-            "ndvi_scale": kc.ndvi_scale,
-            "ndvi_seasonal_avg": kc.ndvi_seasonal_avg,
-            "ndvi_start_of_season": kc.ndvi_start_of_season,
-            "ndvi_end_of_season": kc.ndvi_end_of_season,
-            "ndvi_integral": kc.ndvi_integral,
-            "ndvi_threshold": kc.ndvi_threshold,
-            "ndvi_anomaly_avg": kc.ndvi_anomaly_avg,
-            "seasonal_rainfall_total": kc.seasonal_rainfall_total,
-            "onset_date": kc.onset_date,
-            "cessation_date": kc.cessation_date,
-            "rainy_days_count": kc.rainy_days_count,
-            "dry_spell_days": kc.dry_spell_days,
-            "onset_delay_days": kc.onset_delay_days,
-            "onset_threshold": kc.onset_threshold,
-            "rainy_day_threshold": kc.rainy_day_threshold,
-            "dry_spell_threshold": kc.dry_spell_threshold,
-            "rainfall_std_dev": kc.rainfall_std_dev,
-            "rainfall_skewness": kc.rainfall_skewness,
-            "data_quality_flag": getattr(kc, "data_quality_flag", 1.0),
-            "mean_soil_moisture": kc.mean_soil_moisture,
-            "dry_soil_days": kc.dry_soil_days,
-            "dry_threshold": kc.dry_threshold,
-            "soil_moisture_std": kc.soil_moisture_std,
-            "mean_temp_season": kc.mean_temp_season,
-            "max_temp_avg": kc.max_temp_avg,
-            "min_temp_avg": kc.min_temp_avg,
-            "gdd_total": kc.gdd_total,
-            "gdd_base_temp": kc.gdd_base_temp,
-            "heatwave_days": kc.heatwave_days,
-            "heatwave_threshold": kc.heatwave_threshold,
+    if request.query_params.get('explain') in ('1', 'true'):
+        stats = {}
+        results = query_kebeles([kebele_id], max_distance=100.0, explain=True, stats=stats)[kebele_id]
+        return Response({"success": True, "data": results, "stats": stats}, status=200)
+
+    version = data_version()
+    headers = {
+        'ETag': quote_etag(f"{version}-{_representation(request)}"),
+        'Last-Modified': http_date(version // 10**9),
+        # Clients may keep the body but must revalidate it on every use
+        'Cache-Control': 'private, no-cache',
+        'Vary': 'Accept',
+    }
+    if _not_modified(request, headers['ETag'], version // 10**9):
+        return Response(status=304, headers=headers)
+
+    # Precomputed ranking (see recommender.refresh_recommendations), or a borrowed one
+    results = cached_response(kebele_id, version, lambda: recommendation_responses([kebele_id])[kebele_id])
+    return Response({"success": True, "data": results}, status=200, headers=headers)
+
+# farmer_home parts, shared with the async variant in async_views.py
+def farmer_lands(user):
+    """The farmer's land details with their kebele id, in one query."""
+    return [
+        {
+            "region": land["region"],
+            "location": land["location"],
+            "plot_size": land["plot_size"],
+            "soil_type": land["soil_type"],
+            "irrigation_available": land["irrigation_available"],
+            "kebele_id": land["kebele_id__kebele_id"],
+        }
+        for land in LandDetail.objects.filter(user=user).values(
+            "region", "location", "plot_size", "soil_type", "irrigation_available", "kebele_id__kebele_id")
+    ]
+
+def kebele_locations(land_details_data):
+    """{kebele_id: location of the first land in it} for the lands that have a kebele."""
+    locations = {}
+    for land in land_details_data:
+        if land["kebele_id"] is not None:
+            locations.setdefault(land["kebele_id"], land["location"])
+    return locations
+
+def farmer_recommendations(locations, max_distance=17.0):
+    """Stored recommendations for all the kebeles in one query; kebeles without data of their own borrow from their neighbours."""
+    recommendations = stored_recommendations(locations.keys(), max_distance=max_distance)
+    missing = {kebele_id: locations[kebele_id] for kebele_id in
+               kebeles_without_data(kebele_id for kebele_id, records in recommendations.items() if not records)}
+    if missing:
+        recommendations.update(borrowed_recommendations(missing, max_distance=max_distance))
+    return recommendations
+
+def farmer_matches(user):
+    """The farmer's matches with their exporter and crop requirement, in one query."""
+    from .models import FarmerExporterMatch
+    requirement_fields = ["id", "crop_name", "quantity", "price_per_kg", "harvest_date", "region",
+                          "quality_requirements", "additional_notes", "created_at"]
+    matches_qs = FarmerExporterMatch.objects.filter(farmer=user).values(
+        "id", "crop_name", "exporter__username", "status", "matched_on",
+        *(f"crop_requirement__{f}" for f in requirement_fields))
+    return [
+        {
+            "match_id": match["id"],
+            "crop_name": match["crop_name"],
+            "exporter": match["exporter__username"],
+            "status": match["status"],
+            "matched_on": match["matched_on"],
+            "requirement": {f: match[f"crop_requirement__{f}"] for f in requirement_fields},
         }
-        area_instances.append(area_dict)
-
-    # Get all crops as DataFrame
-    crop_qs = Crop.objects.all()
-    crop_df = pd.DataFrame([{
-        "crop": c.name,
-        "ndvi_peak": c.ndvi_peak,
-        "ndvi_scale": c.ndvi_scale,
-        "ndvi_seasonal_avg": c.ndvi_seasonal_avg,
-        "ndvi_start_of_season": c.ndvi_start_of_season,
-        "ndvi_end_of_season": c.ndvi_end_of_season,
-        "ndvi_integral": c.ndvi_integral,
-        "ndvi_threshold": c.ndvi_threshold,
-        "ndvi_anomaly_avg": c.ndvi_anomaly_avg,
-        "seasonal_rainfall_total_min": c.seasonal_rainfall_total_min,
-        "seasonal_rainfall_total_opt": getattr(c, "seasonal_rainfall_total_opt", 0),
-        "seasonal_rainfall_total_max": getattr(c, "seasonal_rainfall_total_max", 0),
-        "onset_date": getattr(c, "onset_date", 0),
-        "cessation_date": getattr(c, "cessation_date", 0),
-        "rainy_days_count": getattr(c, "rainy_days_count", 0),
-        "dry_spell_days": getattr(c, "dry_spell_days", 0),
-        "onset_delay_days": getattr(c, "onset_delay_days", 0),
-        "onset_threshold": getattr(c, "onset_threshold", 0),
-        "rainy_day_threshold": getattr(c, "rainy_day_threshold", 0),
-        "dry_spell_threshold": getattr(c, "dry_spell_threshold", 0),
-        "rainfall_std_dev": getattr(c, "rainfall_std_dev", 0),
-        "rainfall_skewness": getattr(c, "rainfall_skewness", 0),
-        "data_quality_flag": getattr(c, "data_quality_flag", 1.0),
-        "mean_soil_moisture": getattr(c, "mean_soil_moisture", 0),
-        "dry_soil_days": getattr(c, "dry_soil_days", 0),
-        "dry_threshold": getattr(c, "dry_threshold", 0),
-        "soil_moisture_std": getattr(c, "soil_moisture_std", 0),
-        "mean_temp_season_min": getattr(c, "mean_temp_season_min", 0),
-        "mean_temp_season_max": getattr(c, "mean_temp_season_max", 0),
-        "max_temp_avg": getattr(c, "max_temp_avg", 0),
-        "min_temp_avg": getattr(c, "min_temp_avg", 0),
-        "gdd_total": getattr(c, "gdd_total", 0),
-        "gdd_base_temp": getattr(c, "gdd_base_temp", 0),
-        "heatwave_days": getattr(c, "heatwave_days", 0),
-        "heatwave_threshold": getattr(c, "heatwave_threshold", 0),
-    } for c in crop_qs])
-
-    # Run matcher
-    matcher = CropEnvMatcherForKebele().fit(crop_df)
-    results_df = matcher.query_kebele(area_instances, max_distance=100.0, return_all=False)
-    results = results_df.to_dict(orient="records")
-
-    return Response({"success": True, "data": results}, status=200)
+        for match in matches_qs
+    ]
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(RECOMMENDATION_RENDERERS)
 def farmer_home_view(request):
     """
     Returns recommendations, land details, and matches for the authenticated farmer.
     For each match, includes crop requirement info from the exporter.
+    Supports the columnar format like load_recommendations.
     """
     user = request.user
-    # Get all land details for this farmer
-    land_details = LandDetail.objects.filter(user=user)
-    land_details_data = []
-    kebele_ids = set()
-    for land in land_details:
-        land_details_data.append({
-            "region": land.region,
-            "location": land.location,
-            "plot_size": land.plot_size,
-            "soil_type": land.soil_type,
-            "irrigation_available": land.irrigation_available,
-            "kebele_id": land.kebele_id.kebele_id if land.kebele_id else None,
-        })
-        if land.kebele_id:
-            kebele_ids.add(land.kebele_id.kebele_id)
-
-    # Get recommendations for all kebeles associated with the farmer
-    recommendations = {}
-    for kebele_id in kebele_ids:
-        area_instances = []
-        for kc in KebeleCrop.objects.filter(kebele=kebele_id):
-            area_dict = {
-                "crop": kc.crop.name if hasattr(kc.crop, "name") else str(kc.crop),
-                "ndvi_peak": kc.ndvi_peak,
-                "ndvi_scale": kc.ndvi_scale,
-                "ndvi_seasonal_avg": kc.ndvi_seasonal_avg,
-                "ndvi_start_of_season": kc.ndvi_start_of_season,
-                "ndvi_end_of_season": kc.ndvi_end_of_season,
-                "ndvi_integral": kc.ndvi_integral,
-                "ndvi_threshold": kc.ndvi_threshold,
-                "ndvi_anomaly_avg": kc.ndvi_anomaly_avg,
-                "seasonal_rainfall_total": kc.seasonal_rainfall_total,
-                "onset_date": kc.onset_date,
-                "cessation_date": kc.cessation_date,
-                "rainy_days_count": kc.rainy_days_count,
-                "dry_spell_days": kc.dry_spell_days,
-                "onset_delay_days": kc.onset_delay_days,
-                "onset_threshold": kc.onset_threshold,
-                "rainy_day_threshold": kc.rainy_day_threshold,
-                "dry_spell_threshold": kc.dry_spell_threshold,
-                "rainfall_std_dev": kc.rainfall_std_dev,
-                "rainfall_skewness": kc.rainfall_skewness,
-                "data_quality_flag": getattr(kc, "data_quality_flag", 1.0),
-                "mean_soil_moisture": kc.mean_soil_moisture,
-                "dry_soil_days": kc.dry_soil_days,
-                "dry_threshold": kc.dry_threshold,
-                "soil_moisture_std": kc.soil_moisture_std,
-                "mean_temp_season": kc.mean_temp_season,
-                "max_temp_avg": kc.max_temp_avg,
-                "min_temp_avg": kc.min_temp_avg,
-                "gdd_total": kc.gdd_total,
-                "gdd_base_temp": kc.gdd_base_temp,
-                "heatwave_days": kc.heatwave_days,
-                "heatwave_threshold": kc.heatwave_threshold,
-            }
-            area_instances.append(area_dict)
-
-        crop_qs = Crop.objects.all()
-        crop_df = pd.DataFrame([{
-            "crop": c.name,
-            "ndvi_peak": c.ndvi_peak,
-            "ndvi_scale": c.ndvi_scale,
-            "ndvi_seasonal_avg": c.ndvi_seasonal_avg,
-            "ndvi_start_of_season": c.ndvi_start_of_season,
-            "ndvi_end_of_season": c.ndvi_end_of_season,
-            "ndvi_integral": c.ndvi_integral,
-            "ndvi_threshold": c.ndvi_threshold,
-            "ndvi_anomaly_avg": c.ndvi_anomaly_avg,
-            "seasonal_rainfall_total_min": getattr(c, "seasonal_rainfall_total_min", 0),
-            "seasonal_rainfall_total_opt": getattr(c, "seasonal_rainfall_total_opt", 0),
-            "seasonal_rainfall_total_max": getattr(c, "seasonal_rainfall_total_max", 0),
-            "onset_date": getattr(c, "onset_date", 0),
-            "cessation_date": getattr(c, "cessation_date", 0),
-            "rainy_days_count": getattr(c, "rainy_days_count", 0),
-            "dry_spell_days": getattr(c, "dry_spell_days", 0),
-            "onset_delay_days": getattr(c, "onset_delay_days", 0),
-            "onset_threshold": getattr(c, "onset_threshold", 0),
-            "rainy_day_threshold": getattr(c, "rainy_day_threshold", 0),
-            "dry_spell_threshold": getattr(c, "dry_spell_threshold", 0),
-            "rainfall_std_dev": getattr(c, "rainfall_std_dev", 0),
-            "rainfall_skewness": getattr(c, "rainfall_skewness", 0),
-            "data_quality_flag": getattr(c, "data_quality_flag", 1.0),
-            "mean_soil_moisture": getattr(c, "mean_soil_moisture", 0),
-            "dry_soil_days": getattr(c, "dry_soil_days", 0),
-            "dry_threshold": getattr(c, "dry_threshold", 0),
-            "soil_moisture_std": getattr(c, "soil_moisture_std", 0),
-            "mean_temp_season_min": getattr(c, "mean_temp_season_min", 0),
-            "mean_temp_season_max": getattr(c, "mean_temp_season_max", 0),
-            "max_temp_avg": getattr(c, "max_temp_avg", 0),
-            "min_temp_avg": getattr(c, "min_temp_avg", 0),
-            "gdd_total": getattr(c, "gdd_total", 0),
-            "gdd_base_temp": getattr(c, "gdd_base_temp", 0),
-            "heatwave_days": getattr(c, "heatwave_days", 0),
-            "heatwave_threshold": getattr(c, "heatwave_threshold", 0),
-        } for c in crop_qs])
-
-        # Run matcher
-        matcher = CropEnvMatcherForKebele().fit(crop_df)
-        results_df = matcher.query_kebele(area_instances, max_distance=17.0, return_all=False)
-        rows = results_df.to_dict(orient="records")
-        if rows and "distance" in results_df.columns:
-            recommendations[kebele_id] = results_df.sort_values("distance").reset_index(drop=True).to_dict(orient="records")
-        else:
-            recommendations[kebele_id] = rows
-
-    # Get matches for this farmer
-    from .models import FarmerExporterMatch
-    matches_qs = FarmerExporterMatch.objects.filter(farmer=user)
-    matches = []
-    for match in matches_qs:
-        req = match.crop_requirement
-        matches.append({
-            "match_id": match.id,
-            "crop_name": match.crop_name,
-            "exporter": match.exporter.username,
-            "status": match.status,
-            "matched_on": match.matched_on,
-            "requirement": {
-                "id": req.id,
-                "crop_name": req.crop_name,
-                "quantity": req.quantity,
-                "price_per_kg": req.price_per_kg,
-                "harvest_date": req.harvest_date,
-                "region": req.region,
-                "quality_requirements": req.quality_requirements,
-                "additional_notes": req.additional_notes,
-                "created_at": req.created_at,
-            }
-        })
+    land_details_data = farmer_lands(user)
+    recommendations = farmer_recommendations(kebele_locations(land_details_data))
+    matches = farmer_matches(user)
 
     return Response({
         "success": True,
@@ -345,9 +248,11 @@ def farmer_home_view(request):
     }, status=200)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
 def test_add_kebeles(request):
     """
-    Adds kebeles with the given kebele_ids to the Kebele model.
+    (Staff) Queues the creation of Kebele rows for the given kebele_ids (202 + job, see jobs/).
     """
     kebele_ids = [
         "00d1fc6c-c0b0-4e5d-a9f4-498eb254071c",
@@ -361,16 +266,7 @@ def test_add_kebeles(request):
         "6f3ada95-32d9-4c51-9423-fbafd8d0edaf",
         "41613c5a-b1c3-4c83-b989-b2dbde340ca2",
     ]
-    created = []
-    for kebele_id in kebele_ids:
-        kebele, was_created = Kebele.objects.get_or_create(kebele_id=kebele_id)
-        if was_created:
-            created.append(kebele_id)
-    return Response({
-        "success": True,
-        "created": created,
-        "total": len(kebele_ids)
-    })
+    return accepted(enqueue("add_kebeles", {"kebele_ids": kebele_ids}, request.user))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -379,6 +275,9 @@ def post_crop_requirement(request):
     Receives crop requirement data from frontend, saves it,
     finds matching farmers for the crop, creates FarmerExporterMatch objects,
     and returns the matched farmers (with crop name only).
+    With background=true (for large regions) the matching runs as a job instead:
+    the response is a 202 with the requirement_id and the job, whose result holds
+    the matched farmers.
     """
     user = request.user
     data = request.data
@@ -389,74 +288,64 @@ def post_crop_requirement(request):
     region = data.get('region')
     quality_requirements = data.get('qualityRequirements', '')
     additional_notes = data.get('additionalNotes', '')
+    background = str(data.get('background', '')).lower() in ('1', 'true')
 
     if not all([crop_name, quantity, price_per_kg, harvest_date, region]):
         return Response({'success': False, 'message': 'Missing required fields.'}, status=400)
 
     try:
-        # Save the crop requirement
-        requirement = CropRequirement.objects.create(
-            crop_name=crop_name,
-            quantity=float(quantity),
-            price_per_kg=float(price_per_kg),
-            harvest_date=harvest_date,
-            region=region,
-            quality_requirements=quality_requirements,
-            additional_notes=additional_notes
-        )
-
-        # Find matching farmers with land that can grow this crop
-        matched_farmers = []
-        farmer_users = set()
-        for land in LandDetail.objects.filter(region=region):
-            # You can add more logic here for soil, irrigation, etc.
-            farmer = land.user
-            # Check if farmer already matched for this requirement
-            if farmer.id not in farmer_users:
-                matched_farmers.append({
-                    "farmer_id": farmer.id,
-                    "farmer_username": farmer.username,
-                    "crop_name": crop_name
-                })
-                farmer_users.add(farmer.id)
-                # Create FarmerExporterMatch object
-                FarmerExporterMatch.objects.create(
-                    farmer=farmer,
-                    exporter=user,
-                    crop_requirement=requirement,
-                    land_detail=land,
-                    crop_name=crop_name,
-                    status='pending'
-                )
-
-        return Response({
-            'success': True,
-            'message': 'Crop requirement posted successfully.',
-            'matched_farmers': matched_farmers
-        }, status=201)
+        with transaction.atomic():
+            # Save the crop requirement
+            requirement = CropRequirement.objects.create(
+                exporter=user,
+                crop_name=crop_name,
+                quantity=float(quantity),
+                price_per_kg=float(price_per_kg),
+                harvest_date=harvest_date,
+                region=region,
+                quality_requirements=quality_requirements,
+                additional_notes=additional_notes
+            )
+            if background:
+                job = enqueue("match_requirement", {"requirement_id": requirement.id}, user)
+            else:
+                # Farmers with land in the region (more logic for soil, irrigation, etc. goes there)
+                matched_farmers = match_farmers(requirement)
     except Exception as e:
         return Response({'success': False, 'message': str(e)}, status=400)
 
+    if background:
+        return accepted(job, requirement_id=requirement.id)
+    return Response({
+        'success': True,
+        'message': 'Crop requirement posted successfully.',
+        'matched_farmers': matched_farmers
+    }, status=201)
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import CropRequirement, FarmerExporterMatch
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def exporter_home_view(request):
-    """
-    Returns the exporter's crop requirements and matches.
-    """
-    user = request.user
-
-    # Get requirements posted by this exporter
-    requirements = CropRequirement.objects.filter(created_at__isnull=False, region__isnull=False)  # You may want to filter by exporter if you add a ForeignKey
-
-    # Get matches where this user is the exporter
-    matches = FarmerExporterMatch.objects.filter(exporter=user)
-
-    requirements_data = [
+from .pagination import keyset_page, page_size
+
+# exporter_home parts, shared with the async variant in async_views.py
+def exporter_querysets(user, params):
+    """The exporter's requirements and matches, filtered by the crop / region / status params."""
+    crop, region, match_status = params.get('crop'), params.get('region'), params.get('status')
+    requirements = CropRequirement.objects.filter(exporter=user)
+    matches = FarmerExporterMatch.objects.filter(exporter=user).select_related('farmer', 'land_detail')
+    if crop:
+        requirements = requirements.filter(crop_name=crop)
+        matches = matches.filter(crop_name=crop)
+    if region:
+        requirements = requirements.filter(region=region)
+        matches = matches.filter(crop_requirement__region=region)
+    if match_status:
+        matches = matches.filter(status=match_status)
+    return requirements, matches
+
+def requirements_data(requirements):
+    return [
         {
             "id": req.id,
             "crop_name": req.crop_name,
@@ -471,7 +360,8 @@ def exporter_home_view(request):
         for req in requirements
     ]
 
-    matches_data = [
+def matches_data(matches):
+    return [
         {
             "id": match.id,
             "crop_name": match.crop_name,
@@ -483,8 +373,34 @@ def exporter_home_view(request):
         for match in matches
     ]
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exporter_home_view(request):
+    """
+    Returns the exporter's own crop requirements and matches, newest first, one
+    page of each. Query params (all optional):
+      crop, region         filter requirements and matches
+      status               filter matches (pending, accepted, ...)
+      limit                page size (default 20, max 100)
+      requirements_cursor / matches_cursor
+                           next_*_cursor from the previous response
+    """
+    params = request.query_params
+    requirements, matches = exporter_querysets(request.user, params)
+    try:
+        limit = page_size(params.get('limit'))
+        requirement_page, next_requirements = keyset_page(
+            requirements, 'created_at', params.get('requirements_cursor'), limit)
+        match_page, next_matches = keyset_page(matches, 'matched_on', params.get('matches_cursor'), limit)
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+
     return Response({
         "success": True,
-        "requirements": requirements_data,
-        "matches": matches_data,
-    })
\ No newline at end of file
+        "requirements": requirements_data(requirement_page),
+        "matches": matches_data(match_page),
+        "total_requirements": requirements.count(),
+        "total_matches": matches.count(),
+        "next_requirements_cursor": next_requirements,
+        "next_matches_cursor": next_matches,
+    })
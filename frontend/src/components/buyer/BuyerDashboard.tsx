@@ -27,8 +27,9 @@ export default function BuyerDashboard({ onNavigate }: BuyerDashboardProps) {
         const data = await res.json();
         setStats({
           company: data.company || 'Your Company',
-          totalFarmersMatched: data.matches ? data.matches.length : 0,
-          activeOffers: data.requirements ? data.requirements.length : 0,
+          // lists are paginated; the totals cover every page
+          totalFarmersMatched: data.total_matches ?? (data.matches ? data.matches.length : 0),
+          activeOffers: data.total_requirements ?? (data.requirements ? data.requirements.length : 0),
           totalPurchases: data.total_purchases || 0,
         });
       }